@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+Helpers to run the GIFTs app under gunicorn and measure it with concurrent
+HTTP requests.
+"""
+import os
+import socket
+import subprocess
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def timed_request(request, timeout=120):
+    """ Send a request, returning (latency in seconds, success). Redirects count as success. """
+    start = time.perf_counter()
+    try:
+        _opener.open(request, timeout=timeout).read()
+        ok = True
+    except urllib.error.HTTPError as e:
+        ok = 300 <= e.code < 400
+    except OSError:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summarise(results, elapsed, concurrency):
+    latencies = [latency for latency, _ in results]
+    return {
+        'concurrency': concurrency,
+        'requests': len(results),
+        'errors': sum(1 for _, ok in results if not ok),
+        'elapsed': round(elapsed, 4),
+        'rps': round(len(results) / elapsed, 2),
+        'mean': round(sum(latencies) / len(latencies), 5),
+        'p50': round(percentile(latencies, 50), 5),
+        'p90': round(percentile(latencies, 90), 5),
+        'p99': round(percentile(latencies, 99), 5),
+    }
+
+
+def run_load(make_request, requests, concurrency, label=None):
+    """
+    Send ``requests`` requests built by ``make_request(i)`` from ``concurrency``
+    client threads and summarise latency and throughput, per ``label(i)`` if
+    given.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda i: timed_request(make_request(i)), range(requests)))
+    elapsed = time.perf_counter() - start
+    if label is None:
+        return summarise(results, elapsed, concurrency)
+    groups = {}
+    for i, result in enumerate(results):
+        groups.setdefault(label(i), []).append(result)
+    return {name: summarise(group, elapsed, concurrency) for name, group in groups.items()}
+
+
+class GunicornServer:
+    """
+    The GIFTs app under gunicorn with the gunicorn_config.py of a source tree,
+    by default this repository
+    """
+
+    def __init__(self, env, worker_class='sync', workers=2, threads=1, root=ROOT, poll_interval=0.2):
+        self.root = Path(root)
+        self.poll_interval = poll_interval
+        self.port = free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        self.env = dict(
+            os.environ, **env,
+            PYTHONPATH=os.pathsep.join(filter(None, [str(self.root / 'src'), os.environ.get('PYTHONPATH')])),
+            GUNICORN_BIND=f'127.0.0.1:{self.port}',
+            GUNICORN_WORKERS=str(workers),
+            GUNICORN_WORKER_CLASS=worker_class,
+            GUNICORN_THREADS=str(threads),
+        )
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            ['gunicorn', '--config', str(self.root / 'gunicorn_config.py'), '--log-level', 'warning',
+             '--access-logfile', '/dev/null', 'ensembl.production.gifts.app.main:app'],
+            env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError('gunicorn exited before serving requests')
+            try:
+                urllib.request.urlopen(f'{self.url}/ping', timeout=1).read()
+                return self
+            except OSError:
+                time.sleep(self.poll_interval)
+        self.__exit__()
+        raise RuntimeError(f'gunicorn did not come up on {self.url}')
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+Load test of the GIFTs service against local stand-ins.
+
+Both hive databases are SQLite files seeded with ``--jobs`` jobs and the GIFTs
+REST status endpoint is a stub answering after ``--delay`` seconds. The app
+runs under gunicorn with the repository's configuration, and each scenario
+(ping, list, result, submit) is measured at each concurrency level.
+
+Results are written as JSON (to ``--output`` or stdout); pass a previous
+results file to ``--compare`` to print the change in p50, p99 and RPS.
+
+    python benchmarks/service_load.py --jobs 100000 --concurrency 1,4,16 --output results.json
+    python benchmarks/service_load.py --jobs 100000 --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+
+from loadgen import ROOT, GunicornServer, run_load
+from standins import StatusStub, seed_hive
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+
+def scenarios(base_url, jobs):
+    submission = urllib.parse.urlencode({
+        'ensembl_release': '110', 'environment': 'bench', 'email': 'gifts@example.org',
+        'tag': 'bench', 'auth_token': 'token', 'update_ensembl': 'Update Ensembl'
+    }).encode()
+    return {
+        'ping': lambda i: f'{base_url}/ping',
+        'list': lambda i: urllib.request.Request(f'{base_url}/update_ensembl?limit=25&offset={i % 10 * 25}',
+                                                 headers=JSON_HEADERS),
+        'result': lambda i: urllib.request.Request(f'{base_url}/update_ensembl/{random.randint(1, jobs)}',
+                                                   headers=JSON_HEADERS),
+        'submit': lambda i: urllib.request.Request(f'{base_url}/submit', data=submission, method='POST'),
+    }
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    with open(ROOT / 'VERSION') as f:
+        version = f.read().strip()
+    return {
+        'version': version,
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'jobs': args.jobs,
+        'delay': args.delay,
+        'requests': args.requests,
+        'worker_class': args.worker_class,
+        'workers': args.workers,
+        'threads': args.threads,
+    }
+
+
+def compare(baseline, current):
+    previous = {(r['scenario'], r['concurrency']): r for r in baseline['results']}
+    print(f"{'scenario':<10}{'conc':>6}{'p50 ms':>18}{'p99 ms':>18}{'rps':>20}")
+    for result in current['results']:
+        before = previous.get((result['scenario'], result['concurrency']))
+        if before is None:
+            continue
+        cells = []
+        for key, scale in (('p50', 1000), ('p99', 1000), ('rps', 1)):
+            change = (result[key] - before[key]) / before[key] * 100 if before[key] else 0
+            cells.append(f'{result[key] * scale:10.1f} {change:+6.1f}%')
+        print(f"{result['scenario']:<10}{result['concurrency']:>6}" + ''.join(f'{cell:>18}' for cell in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=10000, help='Jobs seeded in each hive database')
+    parser.add_argument('--delay', type=float, default=0.05, help='GIFTs status stub delay in seconds')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario and concurrency level')
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated concurrency levels')
+    parser.add_argument('--scenarios', default='ping,list,result,submit')
+    parser.add_argument('--worker-class', default='sync')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+    parser.add_argument('--compare', help='Previous JSON results to compare against')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    report = {'meta': metadata(args), 'results': []}
+    with StatusStub(args.delay) as stub, tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        env = {
+            'HIVE_UPDATE_ENSEMBL_URI': seed_hive(os.path.join(tmp, 'update_ensembl.db'), args.jobs),
+            'HIVE_PROCESS_MAPPING_URI': seed_hive(os.path.join(tmp, 'process_mapping.db'), args.jobs),
+            'GIFTS_APIS_URIS_FILE': os.path.join(tmp, 'gifts_api_uris.json'),
+        }
+        report['meta']['seed_seconds'] = round(time.perf_counter() - start, 2)
+        with open(env['GIFTS_APIS_URIS_FILE'], 'w') as f:
+            json.dump({'bench': stub.url}, f)
+
+        with GunicornServer(env, worker_class=args.worker_class, workers=args.workers,
+                            threads=args.threads) as server:
+            requests = scenarios(server.url, args.jobs)
+            for name in args.scenarios.split(','):
+                for level in levels:
+                    result = run_load(requests[name], args.requests, level)
+                    report['results'].append(dict(result, scenario=name))
+                    print(f"{name:<8} c={level:<4} p50={result['p50'] * 1000:8.1f}ms "
+                          f"p99={result['p99'] * 1000:8.1f}ms rps={result['rps']:8.1f} errors={result['errors']}",
+                          file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
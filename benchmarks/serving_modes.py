@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+Compare the sync and threaded (gthread) gunicorn serving modes.
+
+Starts the GIFTs app under gunicorn in each mode, with the GIFTs status
+endpoint served by a local stub that answers after a configurable delay, and
+fires concurrent requests at /status/<environment> (uncached, so every call
+waits on the slow backend) and /ping. Prints a JSON summary per mode.
+
+    python benchmarks/serving_modes.py --delay 0.5 --concurrency 8 --requests 64
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from loadgen import GunicornServer, run_load
+from standins import StatusStub
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--delay', type=float, default=0.5, help='GIFTs status stub delay in seconds')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    results = []
+    with StatusStub(args.delay) as stub, tempfile.TemporaryDirectory() as tmp:
+        uris_file = os.path.join(tmp, 'gifts_api_uris.json')
+        with open(uris_file, 'w') as f:
+            json.dump({'bench': stub.url}, f)
+        env = {'GIFTS_APIS_URIS_FILE': uris_file, 'GIFTS_STATUS_CACHE_TTL': '0'}
+        for mode, threads in (('sync', 1), ('gthread', args.threads)):
+            with GunicornServer(env, worker_class=mode, workers=args.workers, threads=threads) as server:
+                # Interleave slow status checks with pings, as dashboards and a load balancer would
+                label = lambda i: 'status' if i % 2 == 0 else 'ping'
+                paths = {'status': '/status/bench', 'ping': '/ping'}
+                summary = run_load(lambda i: server.url + paths[label(i)], args.requests, args.concurrency, label=label)
+                summary['mode'] = mode
+                results.append(summary)
+    json.dump({'delay': args.delay, 'concurrency': args.concurrency, 'results': results}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
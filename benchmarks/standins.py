@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+Local stand-ins for the GIFTs service backends: a SQLite hive database seeded
+with jobs, and a stub of the GIFTs REST ``/service/status`` endpoint.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sqlalchemy import create_engine, insert, text
+
+from ensembl.production.core.models.hive import Analysis, Base, Job, Result
+from ensembl.production.core.perl_utils import dict_to_perl_string
+
+HIVE_STATUSES = ('DONE', 'DONE', 'DONE', 'FAILED', 'READY', 'RUN')
+
+
+def seed_hive(path, jobs, analysis='submit', chunk_size=10000):
+    """
+    Create a hive schema in a SQLite file and seed it with ``jobs`` submission
+    jobs spread over releases, tags and statuses. Returns the SQLAlchemy URL.
+    """
+    url = f'sqlite:///{path}'
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        # hive indexes job on analysis and status
+        connection.execute(text('CREATE INDEX analysis_status_retry ON job (analysis_id, status)'))
+        connection.execute(insert(Analysis), [{'analysis_id': 1, 'logic_name': analysis}])
+        for start in range(1, jobs + 1, chunk_size):
+            job_rows = []
+            result_rows = []
+            for job_id in range(start, min(start + chunk_size, jobs + 1)):
+                status = HIVE_STATUSES[job_id % len(HIVE_STATUSES)]
+                input_data = {
+                    'ensembl_release': str(90 + job_id % 20),
+                    'environment': 'bench',
+                    'email': 'gifts@example.org',
+                    'tag': f'tag{job_id % 7}',
+                    'rest_server': 'http://localhost',
+                    'timestamp': time.ctime(1600000000 + job_id * 60),
+                }
+                job_rows.append({
+                    'job_id': job_id,
+                    'input_id': dict_to_perl_string(input_data),
+                    'status': status,
+                    'param_id_stack': '',
+                    'analysis_id': 1,
+                    'when_completed': '2020-01-01 00:00:00' if status == 'DONE' else None,
+                })
+                if status == 'DONE':
+                    result_rows.append({'job_id': job_id, 'output': json.dumps({'timestamp': time.ctime()})})
+            connection.execute(insert(Job), job_rows)
+            if result_rows:
+                connection.execute(insert(Result), result_rows)
+    engine.dispose()
+    return url
+
+
+class StatusStub:
+    """ Stub GIFTs REST server answering ``/service/status`` after ``delay`` seconds """
+
+    def __init__(self, delay=0.0, running=None):
+        self.delay = delay
+        self.running = running
+        stub = self
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(stub.delay)
+                status = {'update_ensembl': stub.running == 'update_ensembl',
+                          'process_mapping': stub.running == 'process_mapping'}
+                body = json.dumps(status).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StatusHandler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+Cold-start benchmark of the GIFTs app.
+
+Over ``--repeats`` runs, measures:
+
+    import     time to import the app module in a fresh interpreter
+    ready      time from starting gunicorn with one worker to the first /ping answered
+    first_job  latency of the first hive-backed request, ``--settle`` seconds
+               after ready, which pays for anything deferred to first use and
+               not yet warmed up
+
+``--rev`` measures another git revision too, checked out in a temporary
+worktree, e.g. to compare with the tree before a change:
+
+    python benchmarks/startup.py --repeats 5
+    python benchmarks/startup.py --rev HEAD~1 --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+from loadgen import ROOT, GunicornServer, timed_request
+from standins import seed_hive
+
+IMPORT_APP = ('import time; start = time.perf_counter(); import ensembl.production.gifts.app.main; '
+              'print(time.perf_counter() - start)')
+
+
+def import_time(root, env):
+    env = dict(os.environ, **env,
+               PYTHONPATH=os.pathsep.join(filter(None, [str(root / 'src'), os.environ.get('PYTHONPATH')])))
+    output = subprocess.run([sys.executable, '-c', IMPORT_APP], env=env, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def serving_times(root, env, settle):
+    start = time.perf_counter()
+    with GunicornServer(env, workers=1, root=root, poll_interval=0.01) as server:
+        ready = time.perf_counter() - start
+        time.sleep(settle)
+        request = urllib.request.Request(f'{server.url}/update_ensembl/1', headers={'Content-Type': 'application/json'})
+        first_job, ok = timed_request(request)
+    if not ok:
+        raise RuntimeError(f'First hive-backed request to {server.url} failed')
+    return ready, first_job
+
+
+def summarise(samples):
+    return {'min': round(min(samples), 4), 'median': round(statistics.median(samples), 4),
+            'max': round(max(samples), 4)}
+
+
+def measure(label, root, env, repeats, settle):
+    samples = {'import': [], 'ready': [], 'first_job': []}
+    for _ in range(repeats):
+        samples['import'].append(import_time(root, env))
+        ready, first_job = serving_times(root, env, settle)
+        samples['ready'].append(ready)
+        samples['first_job'].append(first_job)
+    result = {'tree': label, **{name: summarise(values) for name, values in samples.items()}}
+    print(f"{label:<14}" + ''.join(f"{name}={result[name]['median'] * 1000:8.1f}ms " for name in samples),
+          file=sys.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--settle', type=float, default=0.0,
+                        help='Seconds between ready and the first hive-backed request')
+    parser.add_argument('--rev', help='Also measure this git revision')
+    parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    report = {'meta': {'python': platform.python_version(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                       'repeats': args.repeats, 'settle': args.settle}, 'results': []}
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            'HIVE_UPDATE_ENSEMBL_URI': seed_hive(os.path.join(tmp, 'update_ensembl.db'), 100),
+            'HIVE_PROCESS_MAPPING_URI': seed_hive(os.path.join(tmp, 'process_mapping.db'), 100),
+            'GIFTS_APIS_URIS_FILE': os.path.join(tmp, 'gifts_api_uris.json'),
+            'GIFTS_STATUS_POLL_INTERVAL': '0',
+        }
+        with open(env['GIFTS_APIS_URIS_FILE'], 'w') as f:
+            json.dump({'bench': 'http://127.0.0.1:9'}, f)
+
+        trees = [('working tree', ROOT)]
+        worktree = None
+        if args.rev:
+            worktree = os.path.join(tmp, 'rev')
+            subprocess.run(['git', 'worktree', 'add', '--detach', worktree, args.rev], cwd=ROOT, check=True,
+                           capture_output=True)
+            trees.append((args.rev, Path(worktree)))
+        try:
+            for label, root in trees:
+                report['results'].append(measure(label, root, env, args.repeats, args.settle))
+        finally:
+            if worktree is not None:
+                subprocess.run(['git', 'worktree', 'remove', '--force', worktree], cwd=ROOT, capture_output=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
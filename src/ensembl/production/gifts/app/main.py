@@ -11,20 +11,37 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 import os
-import requests, logging
-import sqlalchemy.exc
-from flask import Flask, json, jsonify, redirect, render_template, request, url_for
-from json.decoder import JSONDecodeError
+import logging
+import hashlib
+import queue
+import time
+from datetime import datetime, timezone
+from functools import partial, wraps
+
+from flask import Flask, g, json, jsonify, make_response, redirect, render_template, request, stream_with_context, \
+    url_for
 from flask_bootstrap import Bootstrap4
 from flask_cors import CORS
-from flasgger import Swagger
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 from werkzeug.wrappers import Response
 
 from ensembl.production.core import app_logging
+from ensembl.production.gifts.archive import ArchiveSync, JobArchive
+from ensembl.production.gifts.breaker import CircuitBreaker, CircuitBreakers, CircuitOpenError, GuardedHive
+from ensembl.production.gifts.cache import LRUCache
 from ensembl.production.gifts.config import GIFTsConfig
-from ensembl.production.gifts.forms import GIFTsSubmissionForm
-from ensembl.production.core.models.hive import HiveInstance
+from ensembl.production.gifts.events import JobPollers
+from ensembl.production.gifts.fanout import FanOut
+from ensembl.production.gifts.gifts_api import GIFTsApiUris, GIFTsServiceError, GIFTsStatusClient, GIFTsStatusPoller, \
+    running_pipeline
+from ensembl.production.gifts.metrics import RATE_LIMITED_REQUESTS, InstrumentedHive, init_app as init_metrics, \
+    metrics_response
+from ensembl.production.gifts.profiling import init_app as init_profiling
+from ensembl.production.gifts.registry import hive_registry
+from ensembl.production.gifts.submissions import SubmissionQueue, SubmissionWorker, idempotency_key
+from ensembl.production.gifts.summary import JobSummary
+from ensembl.production.gifts.swagger import LazySwagger
+from ensembl.production.gifts.throttling import SingleFlight, TokenBuckets
 
 app_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 static_path = os.path.join(app_path, 'static')
@@ -41,7 +58,125 @@ Bootstrap4(app)
 
 CORS(app)
 
-Swagger(app, template_file='swagger.yml')
+init_metrics(app)
+
+init_profiling(app,
+               sample_rate=app.config['PROFILE_SAMPLE_RATE'],
+               header=app.config['PROFILE_HEADER'],
+               slow_threshold=app.config['SLOW_REQUEST_THRESHOLD'],
+               profile_dir=app.config['PROFILE_DIR'])
+
+LazySwagger(app, template_file='swagger.yml')
+
+hive_registry.configure(
+    pool_size=app.config['HIVE_POOL_SIZE'],
+    max_overflow=app.config['HIVE_MAX_OVERFLOW'],
+    pool_timeout=app.config['HIVE_POOL_TIMEOUT'],
+    pool_recycle=app.config['HIVE_POOL_RECYCLE'],
+    pool_pre_ping=app.config['HIVE_POOL_PRE_PING'],
+    result_cache_size=app.config['RESULT_CACHE_SIZE'],
+    active_result_ttl=app.config['RESULT_CACHE_ACTIVE_TTL']
+)
+
+# Pages of jobs, keyed by hive version token so they are never served stale
+list_caches = {hive_type: LRUCache(f'{hive_type}_lists', app.config['LIST_CACHE_SIZE'])
+               for hive_type in ('update_ensembl', 'process_mapping')}
+
+# Job counts per pipeline, maintained incrementally by each worker
+job_summaries = {
+    'update_ensembl': JobSummary(lambda: get_hive('update_ensembl'), app.config['HIVE_UPDATE_ENSEMBL_ANALYSIS'],
+                                 rebuild_interval=app.config['SUMMARY_REBUILD_INTERVAL']),
+    'process_mapping': JobSummary(lambda: get_hive('process_mapping'), app.config['HIVE_PROCESS_MAPPING_ANALYSIS'],
+                                  rebuild_interval=app.config['SUMMARY_REBUILD_INTERVAL']),
+}
+
+# Identical hive reads made concurrently by a worker's threads share one query
+hive_reads = SingleFlight('hive_reads')
+
+# Per-client request budget on the read endpoints, disabled with a rate of 0
+rate_limits = None
+if app.config['RATE_LIMIT_RATE'] > 0:
+    rate_limits = TokenBuckets(app.config['RATE_LIMIT_RATE'], app.config['RATE_LIMIT_BURST'])
+
+# Job progress served to reconnecting event clients, read at most once per event interval
+job_events_cache = LRUCache('job_events', app.config['JOB_EVENTS_CACHE_SIZE'])
+
+# Last successful response of hive-backed pages, served with a 503 while their hive is down
+last_known = LRUCache('last_known', app.config['LAST_KNOWN_CACHE_SIZE'])
+
+# Concurrent calls to every backend for the overview
+fan_out = FanOut(max_workers=app.config['OVERVIEW_MAX_WORKERS'])
+
+gifts_api_uris = GIFTsApiUris(app.config["GIFTS_API_URIS_FILE"],
+                              check_interval=app.config["GIFTS_API_URIS_CHECK_INTERVAL"])
+
+job_pollers = JobPollers(lambda hive_type: get_hive(hive_type), interval=app.config['JOB_EVENTS_INTERVAL'])
+
+gifts_status = GIFTsStatusClient(
+    connect_timeout=app.config["GIFTS_STATUS_CONNECT_TIMEOUT"],
+    read_timeout=app.config["GIFTS_STATUS_READ_TIMEOUT"],
+    retries=app.config["GIFTS_STATUS_RETRIES"],
+    backoff_factor=app.config["GIFTS_STATUS_BACKOFF"],
+    cache_ttl=app.config["GIFTS_STATUS_CACHE_TTL"],
+    max_duration=app.config["GIFTS_STATUS_MAX_DURATION"]
+)
+
+
+def hive_unavailable(error):
+    # Connection failures and pool timeouts, not errors in the queries themselves
+    from sqlalchemy.exc import OperationalError, TimeoutError
+    return isinstance(error, (OperationalError, TimeoutError))
+
+
+# Calls to a backend that keeps failing fail fast until a background probe succeeds again
+hive_breakers = CircuitBreakers(lambda hive_type: CircuitBreaker(
+    hive_type, probe=lambda: pooled_hive(hive_type).get_version(), is_failure=hive_unavailable,
+    failure_threshold=app.config['BREAKER_FAILURE_THRESHOLD'], probe_interval=app.config['BREAKER_PROBE_INTERVAL']
+))
+status_breakers = CircuitBreakers(lambda rest_server: CircuitBreaker(
+    rest_server, probe=partial(gifts_status.fetch_status, rest_server),
+    is_failure=lambda e: isinstance(e, GIFTsServiceError),
+    failure_threshold=app.config['BREAKER_FAILURE_THRESHOLD'], probe_interval=app.config['BREAKER_PROBE_INTERVAL']
+))
+
+# Keeps the GIFTs status check out of the submission path, disabled with an interval of 0
+status_poller = None
+if app.config["GIFTS_STATUS_POLL_INTERVAL"] > 0:
+    status_poller = GIFTsStatusPoller(gifts_status, gifts_api_uris, interval=app.config["GIFTS_STATUS_POLL_INTERVAL"])
+
+# Submissions are accepted into a local queue and drained into the hive when a queue file is configured
+submission_queue = None
+submission_worker = None
+if app.config["SUBMISSION_QUEUE_FILE"]:
+    submission_queue = SubmissionQueue(app.config["SUBMISSION_QUEUE_FILE"],
+                                       key_ttl=app.config["SUBMISSION_IDEMPOTENCY_TTL"])
+    # Submissions are retried while the hive is down, and fail on any other error
+    submission_worker = SubmissionWorker(
+        submission_queue, lambda *args: create_jobs(*args),
+        find_submitted=lambda pipeline, analysis, *args: get_hive(pipeline).find_jobs(analysis, *args),
+        is_transient=lambda e: isinstance(e, CircuitOpenError) or hive_unavailable(e),
+        batch_size=app.config["SUBMISSION_BATCH_SIZE"], interval=app.config["SUBMISSION_DRAIN_INTERVAL"]
+    )
+
+    @app.before_request
+    def start_submission_worker():
+        # Drain submissions left in the queue as soon as a worker serves requests
+        submission_worker.start()
+
+# Job lists are served from a local archive of both hives when an archive file is configured
+job_archive = None
+archive_sync = None
+if app.config["ARCHIVE_FILE"]:
+    job_archive = JobArchive(app.config["ARCHIVE_FILE"])
+    archive_sync = ArchiveSync(job_archive, lambda hive_type: get_hive(hive_type),
+                               {'update_ensembl': app.config['HIVE_UPDATE_ENSEMBL_ANALYSIS'],
+                                'process_mapping': app.config['HIVE_PROCESS_MAPPING_ANALYSIS']},
+                               interval=app.config["ARCHIVE_SYNC_INTERVAL"],
+                               max_staleness=app.config["ARCHIVE_MAX_STALENESS"])
+
+    @app.before_request
+    def start_archive_sync():
+        archive_sync.start()
 
 @app.context_processor
 def inject_configs():
@@ -55,55 +190,338 @@ if app.env == 'development':
     )
 
 def get_gifts_api_uri(environment):
-    with open(app.config["GIFTS_API_URIS_FILE"], 'r') as f:
-        gifts_api_uris = json.loads(f.read())
-        if environment in gifts_api_uris.keys():
-            gifts_api_uri = gifts_api_uris[environment]
-        else:
-            raise RuntimeError('Unrecognised Environment: %s' % environment)
-    return gifts_api_uri
+    return gifts_api_uris.resolve(environment)
+
+
+def get_pipeline_status(rest_server):
+    """
+    Pipeline status of a GIFTs server and its age, from the background
+    poller's snapshot if recent enough, otherwise checked live.
+    Raises GIFTsServiceError if the status cannot be retrieved.
+    """
+    snapshot = status_poller.snapshot(rest_server) if status_poller is not None else None
+    if snapshot is not None:
+        pipeline_status, error, age = snapshot
+        if age <= app.config["GIFTS_STATUS_MAX_STALENESS"]:
+            if error is not None:
+                raise GIFTsServiceError(error)
+            return pipeline_status, age
+    try:
+        return status_breakers.get(rest_server).call(gifts_status.get_status, rest_server)
+    except CircuitOpenError as e:
+        raise GIFTsServiceError(str(e)) from e
 
 
 def get_status(rest_server):
-    status_uri = f'{rest_server}/service/status'
-
     try:
-        status_response = requests.get(status_uri)
-    except requests.RequestException as e:
-        app.logger.error(f'Unable to retrieve status from GIFTs service {e}: {status_uri}')
-        return f'Unable to retrieve status from GIFTs service {e}'
-    try:
-        pipeline_status = json.loads(status_response.text)
-    except JSONDecodeError as e:
-        app.logger.error(f'Error loading GIFTs service information {e}: {status_response.text}')
-        return f'Error loading GIFTs service information {e}'
-
-    for status, running in pipeline_status.items():
-        if running:
-            return status.replace('_', ' ').capitalize()
-
-    return None
-
-
-def get_hive(hive_type):
+        pipeline_status, _ = get_pipeline_status(rest_server)
+    except GIFTsServiceError as e:
+        app.logger.error(f'{e}: {rest_server}/service/status')
+        return str(e)
+
+    return running_pipeline(pipeline_status)
+
+
+def job_event(job_id, job):
+    if job is None:
+        return 'event: error\ndata: %s\n\n' % json.dumps({'error': 'Job %s not found' % job_id})
+    event = 'event: status\ndata: %s\n\n' % json.dumps(job)
+    if job['status'] in ('complete', 'failed'):
+        event += 'event: end\ndata: {}\n\n'
+    return event
+
+
+def job_events(hive_type, job_id):
+    # Fails early if the pipeline's hive is not configured
+    hive = get_hive(hive_type)
+    retry = 'retry: %d\n\n' % (app.config['JOB_EVENTS_INTERVAL'] * 1000)
+    if not app.config['JOB_EVENTS_STREAMING']:
+        # One event per request, EventSource clients reconnect after the retry
+        # interval, so that sync workers are never held by a stream
+        key = (hive_type, job_id)
+        cached = job_events_cache.get(key)
+        if cached is None:
+            # Wrapped, as a job that does not exist is cached as None
+            cached = hive_reads.do((hive_type, 'events', job_id),
+                                   lambda: (hive.get_results_for_job_ids([job_id], progress=True).get(job_id),))
+            job_events_cache.set(key, cached, ttl=app.config['JOB_EVENTS_INTERVAL'])
+        job = cached[0]
+        return Response(retry + job_event(job_id, job), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache'})
+
+    poller = job_pollers.get(hive_type)
+    heartbeat = app.config['JOB_EVENTS_HEARTBEAT']
+    deadline = time.monotonic() + app.config['JOB_EVENTS_TIMEOUT']
+
+    def generate():
+        subscriber = poller.subscribe(job_id)
+        try:
+            yield retry
+            while time.monotonic() < deadline:
+                try:
+                    job = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield job_event(job_id, job)
+                if job is None or job['status'] in ('complete', 'failed'):
+                    return
+        finally:
+            poller.unsubscribe(job_id, subscriber)
+
+    # Streams are closed after JOB_EVENTS_TIMEOUT, EventSource clients reconnect
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def database_error():
+    # SQLAlchemy is only imported with the hive models, on first use of a hive.
+    # Includes waiting too long for a pooled connection.
+    from sqlalchemy.exc import DatabaseError, TimeoutError
+    return DatabaseError, TimeoutError
+
+
+def submission_form():
+    # WTForms' email validator pulls in dnspython, only needed for the form
+    from ensembl.production.gifts.forms import GIFTsSubmissionForm
+    return GIFTsSubmissionForm(request.form)
+
+
+def pooled_hive(hive_type):
     if hive_type == 'update_ensembl':
         if app.config["HIVE_UPDATE_ENSEMBL_URI"] is None:
             raise RuntimeError('Undefined environment variable: HIVE_UPDATE_ENSEMBL_URI')
         else:
-            hive = HiveInstance(app.config["HIVE_UPDATE_ENSEMBL_URI"])
+            hive = hive_registry.get(hive_type, app.config["HIVE_UPDATE_ENSEMBL_URI"])
     elif hive_type == 'process_mapping':
         if app.config["HIVE_PROCESS_MAPPING_URI"] is None:
             raise RuntimeError('Undefined environment variable: HIVE_PROCESS_MAPPING_URI')
         else:
-            hive = HiveInstance(app.config["HIVE_PROCESS_MAPPING_URI"])
+            hive = hive_registry.get(hive_type, app.config["HIVE_PROCESS_MAPPING_URI"])
     else:
         raise RuntimeError('Unrecognised Pipeline: %s' % hive_type)
     return hive
 
 
+def get_hive(hive_type):
+    return InstrumentedHive(GuardedHive(pooled_hive(hive_type), hive_breakers.get(hive_type)), hive_type)
+
+
+def job_source(hive_type):
+    # Where job lists are read from: the archive, brought up to date by
+    # conditional_on_hive, or the hive itself
+    if g.get('archive_ready'):
+        return job_archive.pipeline(hive_type)
+    return get_hive(hive_type)
+
+
+def job_list_version(hive_type):
+    # The archive is only read once it holds all the jobs of the current hive
+    # database, which the background sync copies on a fresh archive or reseed
+    g.archive_ready = job_archive is not None and job_archive.ready(hive_type)
+    if g.archive_ready:
+        archive_sync.refresh(hive_type)
+        g.archive_ready = job_archive.ready(hive_type)
+    if g.archive_ready:
+        return job_archive.version(hive_type)
+    return hive_reads.do((hive_type, 'version'), get_hive(hive_type).get_version)
+
+
+def client_id():
+    # Behind a proxy, the client is the first address of RATE_LIMIT_CLIENT_HEADER, e.g. X-Forwarded-For
+    header = app.config['RATE_LIMIT_CLIENT_HEADER']
+    if header and request.headers.get(header):
+        return request.headers[header].split(',')[0].strip()
+    return request.remote_addr
+
+
+def rate_limited(view):
+    """ Reject requests beyond the client's budget with a 429 and Retry-After """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if rate_limits is not None:
+            retry_after = rate_limits.acquire(client_id())
+            if retry_after:
+                RATE_LIMITED_REQUESTS.labels(request.endpoint).inc()
+                return jsonify({'error': 'Too many requests', 'retry_after': retry_after}), 429, \
+                    {'Retry-After': str(retry_after)}
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# Time each hive version token was first seen by this worker, as Last-Modified
+hive_versions = {}
+
+
+def conditional_on_hive(hive_type):
+    """
+    Answer conditional GETs from the hive version token, or the archive's,
+    without querying or serialising the jobs when the client's copy is still
+    current.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            token = job_list_version(hive_type)
+            g.hive_version = token
+            seen_token, last_modified = hive_versions.get(hive_type, (None, None))
+            if seen_token != token:
+                last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+                hive_versions[hive_type] = (token, last_modified)
+            etag = hashlib.sha1(f'{token}|{request.full_path}|{request.is_json}'.encode()).hexdigest()
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                not_modified = request.if_modified_since is not None and request.if_modified_since >= last_modified
+            response = Response(status=304) if not_modified else make_response(view(*args, **kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(etag)
+                response.last_modified = last_modified
+                response.vary.add('Content-Type')
+            if response.status_code == 200 and not response.is_streamed:
+                last_known.set((request.full_path, request.is_json),
+                               (time.time(), response.get_data(), response.mimetype))
+            return response
+        return wrapper
+    return decorator
+
+
+def get_list_filters():
+    # Query parameters pushed down into the hive job query. Pages are newest
+    # first by default, whole lists in job_id order as they always were.
+    limit = request.args.get('limit', type=int)
+    order = request.args.get('order', '').lower() or ('asc' if limit is None else 'desc')
+    return {
+        'limit': limit,
+        'offset': request.args.get('offset', type=int),
+        'after_job_id': request.args.get('after_job_id', type=int),
+        'order': 'asc' if order == 'asc' else 'desc',
+        'status': request.args.get('status') or None,
+        'ensembl_release': request.args.get('ensembl_release') or None,
+        'tag': request.args.get('tag') or None,
+    }
+
+
+def get_list_fields():
+    # Dotted job fields to return, e.g. input.tag, or None for whole jobs
+    fields = [field.strip() for value in request.args.getlist('fields') for field in value.split(',')]
+    return [field for field in fields if field] or None
+
+
+def project(job, fields):
+    """ Copy of a job with only the given dotted fields, skipping those it does not have """
+    projected = {}
+    for field in fields:
+        *parents, name = field.split('.')
+        source = job
+        for parent in parents:
+            source = source.get(parent) if isinstance(source, dict) else None
+        if isinstance(source, dict) and name in source:
+            target = projected
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[name] = source[name]
+    return projected
+
+
+def buffered(chunks, size=100):
+    # Join small chunks so that streamed responses are not written piecemeal
+    buffer = []
+    for chunk in chunks:
+        buffer.append(chunk)
+        if len(buffer) >= size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def json_array(jobs):
+    yield '['
+    for i, job in enumerate(jobs):
+        yield (',' if i else '') + json.dumps(job, separators=(',', ':'))
+    yield ']\n'
+
+
+def ndjson_lines(jobs):
+    for job in jobs:
+        yield json.dumps(job, separators=(',', ':')) + '\n'
+
+
+def get_page(hive, analysis, filters):
+    jobs = hive.get_results(analysis, **filters)
+    total = hive.count_jobs(analysis, filters['status'], filters['ensembl_release'], filters['tag'])
+    return {'total': total, 'rows': jobs}
+
+
+def list_jobs(hive_type, analysis, submission_type):
+    filters = get_list_filters()
+    fields = get_list_fields()
+
+    if request.accept_mimetypes.best == 'application/x-ndjson':
+        jobs = job_source(hive_type).iter_results(analysis, **filters)
+        if fields:
+            jobs = (project(job, fields) for job in jobs)
+        return Response(stream_with_context(buffered(ndjson_lines(jobs))), mimetype='application/x-ndjson')
+    elif request.is_json:
+        hive = job_source(hive_type)
+        if filters['limit'] is None:
+            # The whole history, streamed rather than built in memory
+            jobs = hive.iter_results(analysis, **filters)
+            if fields:
+                jobs = (project(job, fields) for job in jobs)
+            return Response(stream_with_context(buffered(json_array(jobs))), mimetype='application/json')
+        key = (g.get('hive_version'), tuple(sorted(filters.items())))
+        page = list_caches[hive_type].get(key) if key[0] is not None else None
+        if page is None:
+            page = hive_reads.do((hive_type, 'page', key), partial(get_page, hive, analysis, filters))
+            if key[0] is not None:
+                list_caches[hive_type].set(key, page, ttl=app.config['LIST_CACHE_TTL'])
+        if fields:
+            page = {'total': page['total'], 'rows': [project(job, fields) for job in page['rows']]}
+        return jsonify(page)
+    else:
+        # Rows are fetched by bootstrap-table as JSON, projected on the table's
+        # columns, and only the visible ones are rendered. The full history is
+        # loaded at once with stream, otherwise a page at a time.
+        query = {key: filters[key] for key in ('status', 'ensembl_release', 'tag') if filters[key] is not None}
+        return render_template('list.html', submission_type=submission_type,
+                               data_url=url_for(request.endpoint, **query),
+                               side_pagination='client' if request.args.get('stream') else 'server')
+
+
+def job_summary(hive_type):
+    summary = job_summaries[hive_type].summary(g.get('hive_version'))
+    return jsonify(dict(summary, pipeline=hive_type))
+
+
+def show_job(hive_type, job_id, submission_type):
+    job = job_source(hive_type).get_result_for_job_id(job_id) if g.get('archive_ready') else None
+    if job is None:
+        job = hive_reads.do((hive_type, 'job', job_id, g.get('hive_version')),
+                            partial(get_hive(hive_type).get_result_for_job_id, job_id, progress=False))
+
+    if request.is_json:
+        response = make_response(jsonify(job))
+    else:
+        response = make_response(render_template('list.html', submission_type=submission_type, jobs=[job]))
+    if job['status'] in ('complete', 'failed'):
+        # Jobs in a terminal state no longer change
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config['JOB_TERMINAL_MAX_AGE']
+    return response
+
+
 def submit_job(payload, analysis, action):
+    if payload is None:
+        payload = request.json
+
     rest_server = get_gifts_api_uri(payload['environment'])
 
+    if submission_queue is not None:
+        return queue_job(payload, analysis, action, rest_server)
+
     status = get_status(rest_server)
     if status is not None:
         if request.is_json:
@@ -111,12 +529,12 @@ def submit_job(payload, analysis, action):
         else:
             return display_form(status)
 
-    if payload is None:
-        payload = request.json
-
     payload['rest_server'] = rest_server
 
     job = get_hive(action).create_job(analysis, payload)
+    list_caches[action].clear()
+    if archive_sync is not None:
+        archive_sync.notify()
 
     if request.is_json:
         results = {"job_id": job.job_id}
@@ -125,6 +543,94 @@ def submit_job(payload, analysis, action):
         return redirect(url_for(action + '_result', job_id=str(job.job_id)))
 
 
+def queue_submission(payload, analysis, action, rest_server, client_key=None):
+    key = idempotency_key(action, payload, client_key)
+    payload['rest_server'] = rest_server
+    submission, created = submission_queue.enqueue(action, analysis, payload, key)
+    if created:
+        submission_worker.notify()
+    return submission
+
+
+def queue_job(payload, analysis, action, rest_server):
+    submission = queue_submission(payload, analysis, action, rest_server, request.headers.get('Idempotency-Key'))
+    location = url_for('submission_status', submission_id=submission['submission_id'])
+    if request.is_json:
+        return jsonify(submission), 202, {'Location': location}
+    else:
+        return redirect(location)
+
+
+def create_jobs(action, analysis, payloads):
+    """
+    Create the hive jobs for payloads with their rest_server set, checking the
+    status of each GIFTs server once. Returns a dict per payload with either
+    its job_id or an error. Hive errors are raised.
+    """
+    results = [None] * len(payloads)
+    by_server = {}
+    for i, payload in enumerate(payloads):
+        by_server.setdefault(payload['rest_server'], []).append(i)
+
+    # One status check per GIFTs server, however many submissions target it
+    accepted = []
+    for rest_server, indexes in by_server.items():
+        status = get_status(rest_server)
+        for i in indexes:
+            if status is not None:
+                results[i] = {'error': 'Submission aborted: %s' % status}
+            else:
+                accepted.append(i)
+
+    if accepted:
+        job_ids = get_hive(action).create_jobs(analysis, [payloads[i] for i in accepted])
+        list_caches[action].clear()
+        if archive_sync is not None:
+            archive_sync.notify()
+        for i, job_id in zip(accepted, job_ids):
+            results[i] = {'job_id': job_id}
+    return results
+
+
+def submit_batch(payloads, analysis, action):
+    if not isinstance(payloads, list):
+        return jsonify({'error': 'Expected a list of submissions'}), 400
+    if len(payloads) > app.config['SUBMIT_BATCH_MAX_SIZE']:
+        return jsonify({'error': 'At most %s submissions can be made at once' % app.config['SUBMIT_BATCH_MAX_SIZE']}), 400
+
+    results = [None] * len(payloads)
+    resolved = []
+    for i, payload in enumerate(payloads):
+        if not isinstance(payload, dict) or 'environment' not in payload:
+            results[i] = {'error': 'Missing environment'}
+            continue
+        try:
+            rest_server = get_gifts_api_uri(payload['environment'])
+        except RuntimeError as e:
+            results[i] = {'error': str(e)}
+            continue
+        resolved.append((i, rest_server))
+
+    if submission_queue is not None:
+        for i, rest_server in resolved:
+            client_key = payloads[i].pop('idempotency_key', None)
+            results[i] = queue_submission(payloads[i], analysis, action, rest_server, client_key)
+        return jsonify(results), 202
+
+    for i, rest_server in resolved:
+        payloads[i]['rest_server'] = rest_server
+    if resolved:
+        try:
+            created = create_jobs(action, analysis, [payloads[i] for i, _ in resolved])
+        except (*database_error(), CircuitOpenError, ValueError) as e:
+            app.logger.error(f'Unable to submit batch of {len(resolved)} jobs: {e}')
+            created = [{'error': f'Unable to submit job: {e}'}] * len(resolved)
+        for (i, _), result in zip(resolved, created):
+            results[i] = result
+
+    return jsonify(results)
+
+
 @app.route('/', methods=['GET'])
 def index():
     return render_template('submit.html')
@@ -135,29 +641,42 @@ def update_ensembl(payload=None):
     analysis = app.config['HIVE_UPDATE_ENSEMBL_ANALYSIS']
     try:
         return submit_job(payload, analysis, 'update_ensembl')
-    except sqlalchemy.exc.DatabaseError as e :
+    except database_error() as e :
         return display_form(status=f'Unable to submit job: {e}')
 
 
+@app.route('/update_ensembl/batch', methods=['POST'])
+def update_ensembl_batch():
+    analysis = app.config['HIVE_UPDATE_ENSEMBL_ANALYSIS']
+    return submit_batch(request.get_json(silent=True), analysis, 'update_ensembl')
+
+
 @app.route('/update_ensembl', methods=['GET'])
+@rate_limited
+@conditional_on_hive('update_ensembl')
 def update_ensembl_list():
     analysis = app.config['HIVE_UPDATE_ENSEMBL_ANALYSIS']
-    jobs = get_hive('update_ensembl').get_all_results(analysis)
+    return list_jobs('update_ensembl', analysis, 'Update Ensembl')
 
-    if request.is_json:
-        return jsonify(jobs)
-    else:
-        return render_template('list.html', submission_type='Update Ensembl', jobs=jobs)
+
+@app.route('/update_ensembl/summary', methods=['GET'])
+@rate_limited
+@conditional_on_hive('update_ensembl')
+def update_ensembl_summary():
+    return job_summary('update_ensembl')
 
 
 @app.route('/update_ensembl/<int:job_id>', methods=['GET'])
+@rate_limited
+@conditional_on_hive('update_ensembl')
 def update_ensembl_result(job_id):
-    job = get_hive('update_ensembl').get_result_for_job_id(job_id, progress=False)
+    return show_job('update_ensembl', job_id, 'Update Ensembl')
 
-    if request.is_json:
-        return jsonify(job)
-    else:
-        return render_template('list.html', submission_type='Update Ensembl', jobs=[job])
+
+@app.route('/update_ensembl/<int:job_id>/events', methods=['GET'])
+@rate_limited
+def update_ensembl_events(job_id):
+    return job_events('update_ensembl', job_id)
 
 
 @app.route('/process_mapping', methods=['POST'])
@@ -165,35 +684,132 @@ def process_mapping(payload=None):
     analysis = app.config['HIVE_PROCESS_MAPPING_ANALYSIS']
     try:
         return submit_job(payload, analysis, 'process_mapping')
-    except sqlalchemy.exc.DatabaseError as e :
+    except database_error() as e :
         return display_form(status=f'Unable to submit job: {e}')
 
 
 
+@app.route('/process_mapping/batch', methods=['POST'])
+def process_mapping_batch():
+    analysis = app.config['HIVE_PROCESS_MAPPING_ANALYSIS']
+    return submit_batch(request.get_json(silent=True), analysis, 'process_mapping')
+
+
 @app.route('/process_mapping', methods=['GET'])
+@rate_limited
+@conditional_on_hive('process_mapping')
 def process_mapping_list():
     analysis = app.config['HIVE_PROCESS_MAPPING_ANALYSIS']
-    jobs = get_hive('process_mapping').get_all_results(analysis)
+    return list_jobs('process_mapping', analysis, 'Process Mapping')
 
-    if request.is_json:
-        return jsonify(jobs)
-    else:
-        return render_template('list.html', submission_type='Process Mapping', jobs=jobs)
+
+@app.route('/process_mapping/summary', methods=['GET'])
+@rate_limited
+@conditional_on_hive('process_mapping')
+def process_mapping_summary():
+    return job_summary('process_mapping')
 
 
 @app.route('/process_mapping/<int:job_id>', methods=['GET'])
+@rate_limited
+@conditional_on_hive('process_mapping')
 def process_mapping_result(job_id):
-    job = get_hive('process_mapping').get_result_for_job_id(job_id, progress=False)
+    return show_job('process_mapping', job_id, 'Process Mapping')
+
+
+@app.route('/process_mapping/<int:job_id>/events', methods=['GET'])
+@rate_limited
+def process_mapping_events(job_id):
+    return job_events('process_mapping', job_id)
+
+
+@app.route('/submissions/<int:submission_id>', methods=['GET'])
+def submission_status(submission_id):
+    submission = submission_queue.get(submission_id) if submission_queue is not None else None
+    if submission is None:
+        return jsonify({'error': 'Unknown submission: %s' % submission_id}), 404
 
     if request.is_json:
-        return jsonify(job)
+        return jsonify(submission)
+    elif submission['status'] == 'submitted':
+        return redirect(url_for(submission['pipeline'] + '_result', job_id=str(submission['job_id'])))
     else:
-        return render_template('list.html', submission_type='Process Mapping', jobs=[job])
+        return render_template('submission.html', submission=submission)
+
+
+@app.route('/jobs', methods=['GET'])
+@rate_limited
+def jobs_results():
+    try:
+        ids = sorted({int(job_id) for value in request.args.getlist('ids')
+                      for job_id in value.split(',') if job_id.strip()})
+    except ValueError:
+        return jsonify({'error': 'Job IDs must be integers'}), 400
+    if len(ids) > app.config['JOBS_MAX_IDS']:
+        return jsonify({'error': 'At most %s job IDs can be requested at once' % app.config['JOBS_MAX_IDS']}), 400
+    pipelines = [pipeline for value in request.args.getlist('pipeline')
+                 for pipeline in value.split(',') if pipeline.strip()] or ['update_ensembl', 'process_mapping']
+
+    results = {}
+    for pipeline in pipelines:
+        try:
+            hive = get_hive(pipeline)
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 400
+        jobs = hive.get_results_for_job_ids(ids)
+        results[pipeline] = {job_id: jobs.get(job_id) for job_id in ids}
+
+    return jsonify(results)
+
+
+def environment_overview(rest_server):
+    pipeline_status, age = get_pipeline_status(rest_server)
+    return {'pipelines': pipeline_status, 'running': running_pipeline(pipeline_status), 'age': round(age, 3)}
+
+
+def pipeline_overview(hive_type):
+    summary = job_summaries[hive_type].summary()
+    latest = [release['latest'] for release in summary['by_release'].values()]
+    return {
+        'total': summary['total'],
+        'by_status': summary['by_status'],
+        'latest': max(latest, key=lambda job: job['job_id']) if latest else None,
+    }
+
+
+@app.route('/overview', methods=['GET'])
+@rate_limited
+def overview():
+    # Every GIFTs environment and both hives are queried concurrently, each
+    # within its own timeout, and whatever answered in time is returned
+    start = time.monotonic()
+    try:
+        environments = gifts_api_uris.uris()
+    except (OSError, ValueError) as e:
+        app.logger.error(f'Unable to read GIFTs API URIs: {e}')
+        environments = {}
+
+    calls = {('status', rest_server): (partial(environment_overview, rest_server), app.config['OVERVIEW_STATUS_TIMEOUT'])
+             for rest_server in set(environments.values())}
+    calls.update({('hive', hive_type): (partial(pipeline_overview, hive_type), app.config['OVERVIEW_HIVE_TIMEOUT'])
+                  for hive_type in ('update_ensembl', 'process_mapping')})
+    results = fan_out.run(calls)
+
+    overview = {
+        'environments': {environment: results[('status', rest_server)]
+                         for environment, rest_server in sorted(environments.items())},
+        'pipelines': {hive_type: results[('hive', hive_type)] for hive_type in ('update_ensembl', 'process_mapping')},
+        'elapsed': round(time.monotonic() - start, 3),
+    }
+    if request.is_json:
+        return jsonify(overview)
+    else:
+        return render_template('overview.html', overview=overview)
 
 
 @app.route('/submit', methods=['GET'])
 def display_form(status=None):
-    form = GIFTsSubmissionForm(request.form)
+    form = submission_form()
 
     return render_template(
         'submit.html',
@@ -206,7 +822,7 @@ def display_form(status=None):
 def submit_form():
     # Convert the form fields into a 'payload' dictionary
     # that is the required input format for the hive submission.
-    form = GIFTsSubmissionForm(request.form)
+    form = submission_form()
 
     payload = {
         'ensembl_release': form.ensembl_release.data,
@@ -224,6 +840,66 @@ def submit_form():
         raise RuntimeError('Unrecognised submission type')
 
 
+@app.route('/status/<string:environment>', methods=['GET'])
+@rate_limited
+def environment_status(environment):
+    try:
+        rest_server = get_gifts_api_uri(environment)
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 404
+
+    try:
+        pipeline_status, age = get_pipeline_status(rest_server)
+    except GIFTsServiceError as e:
+        app.logger.error(f'{e}: {rest_server}/service/status')
+        unavailable = {'environment': environment, 'error': str(e)}
+        last_status = gifts_status.last_status(rest_server)
+        if last_status is not None:
+            unavailable['last_known'] = {'pipelines': last_status[0], 'running': running_pipeline(last_status[0]),
+                                         'age': round(last_status[1], 3)}
+        return jsonify(unavailable), 503
+
+    return jsonify({
+        'environment': environment,
+        'pipelines': pipeline_status,
+        'running': running_pipeline(pipeline_status),
+        'age': round(age, 3)
+    })
+
+
 @app.route('/ping', methods=['GET'])
 def ping():
     return jsonify({'status': 'ok'})
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    # Always 200 so that a load balancer keeps routing to workers which can
+    # still serve the pages not depending on the backends that are down
+    hives = {hive_type: hive_breakers.get(hive_type).status() for hive_type in ('update_ensembl', 'process_mapping')}
+    gifts_services = {rest_server: breaker.status() for rest_server, breaker in status_breakers.items()}
+    degraded = any(status['state'] != 'closed' for status in [*hives.values(), *gifts_services.values()])
+    return jsonify({'status': 'degraded' if degraded else 'ok', 'hives': hives, 'gifts_services': gifts_services})
+
+
+@app.errorhandler(CircuitOpenError)
+def backend_unavailable(e):
+    headers = {'Retry-After': str(e.retry_after)}
+    cached = last_known.get((request.full_path, request.is_json)) if request.method == 'GET' else None
+    if request.is_json:
+        unavailable = {'error': str(e), 'backend': e.backend}
+        if cached is not None:
+            unavailable['last_known'] = json.loads(cached[1])
+            unavailable['last_known_age'] = round(time.time() - cached[0], 3)
+        return jsonify(unavailable), 503, headers
+    if cached is not None:
+        headers['Warning'] = '110 - "Response is Stale"'
+        return Response(cached[1], status=503, mimetype=cached[2], headers=headers)
+    if request.method == 'POST':
+        return display_form(status=str(e)), 503, headers
+    return Response(f'{e}, retry in {e.retry_after}s\n', status=503, mimetype='text/plain', headers=headers)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return metrics_response()
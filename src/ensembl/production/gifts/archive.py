@@ -0,0 +1,384 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+Local archive of the jobs of both pipelines, synced incrementally from hive.
+
+Job results are copied into a SQLite database shared by all the workers of
+the service, indexed on release, status and tag, so that job lists are read
+from it rather than from the hive databases, and the job history survives
+the hive databases being dropped or reseeded between releases.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date
+
+from werkzeug.http import http_date
+
+from ensembl.production.gifts.sqlite_store import SQLiteStore
+
+__all__ = ['JobArchive', 'ArchivedPipeline', 'ArchiveSync']
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job (
+    pipeline TEXT NOT NULL,
+    epoch INTEGER NOT NULL,
+    job_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    result_status TEXT NOT NULL,
+    ensembl_release TEXT,
+    tag TEXT,
+    environment TEXT,
+    result TEXT NOT NULL,
+    archived REAL NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (pipeline, epoch, job_id)
+);
+CREATE INDEX IF NOT EXISTS job_release ON job (pipeline, ensembl_release, epoch, job_id);
+CREATE INDEX IF NOT EXISTS job_status ON job (pipeline, status, epoch, job_id);
+CREATE INDEX IF NOT EXISTS job_tag ON job (pipeline, tag, epoch, job_id);
+CREATE INDEX IF NOT EXISTS job_active ON job (pipeline, epoch, job_id)
+    WHERE result_status NOT IN ('complete', 'failed');
+CREATE TABLE IF NOT EXISTS archive_state (
+    pipeline TEXT PRIMARY KEY,
+    epoch INTEGER NOT NULL,
+    last_job_id INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    synced REAL NOT NULL,
+    complete_epoch INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def _json_default(value):
+    # Dates as rendered by Flask's JSON encoder, so archived and live jobs look the same
+    if isinstance(value, date):
+        return http_date(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class JobArchive(SQLiteStore):
+    """
+    Job results of each pipeline stored in SQLite, with the job's own status,
+    as filtered on by the job lists, alongside.
+
+    Job ids restart when a hive database is reseeded, so the jobs of each
+    successive hive database, or epoch, are kept apart. Lists return the jobs
+    of the current epoch first, then those of earlier ones. The version of a
+    pipeline changes whenever any of its jobs is added or changed. An epoch
+    is complete once all the jobs of its hive database have been archived.
+    """
+
+    def __init__(self, path):
+        super().__init__(path, SCHEMA)
+
+    def state(self, pipeline):
+        with self._reading() as connection:
+            row = connection.execute('SELECT * FROM archive_state WHERE pipeline = ?', (pipeline,)).fetchone()
+        return dict(row) if row is not None else {'pipeline': pipeline, 'epoch': 1, 'last_job_id': 0, 'version': 0,
+                                                  'synced': 0.0, 'complete_epoch': 0}
+
+    def ready(self, pipeline):
+        """ Whether the current epoch is complete, so that job lists can be read from the archive """
+        state = self.state(pipeline)
+        return state['complete_epoch'] == state['epoch']
+
+    def version(self, pipeline):
+        state = self.state(pipeline)
+        return f"archive:{state['epoch']}:{state['version']}"
+
+    def claim_sync(self, pipeline, max_age=0):
+        """
+        Mark the pipeline as being synced and return its state, unless it was
+        synced less than ``max_age`` seconds ago, by any process
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                'INSERT OR IGNORE INTO archive_state (pipeline, epoch, last_job_id, version, synced) '
+                'VALUES (?, 1, 0, 0, 0)', (pipeline,)
+            )
+            row = connection.execute('SELECT * FROM archive_state WHERE pipeline = ?', (pipeline,)).fetchone()
+            if now - row['synced'] < max_age:
+                return None
+            connection.execute('UPDATE archive_state SET synced = ? WHERE pipeline = ?', (now, pipeline))
+        return dict(row)
+
+    def new_epoch(self, pipeline):
+        """ Start archiving the jobs of a new hive database, returning the new epoch """
+        with self._transaction() as connection:
+            connection.execute(
+                'UPDATE archive_state SET epoch = epoch + 1, last_job_id = 0, version = version + 1 '
+                'WHERE pipeline = ?', (pipeline,)
+            )
+            return connection.execute('SELECT epoch FROM archive_state WHERE pipeline = ?',
+                                      (pipeline,)).fetchone()['epoch']
+
+    def complete_epoch(self, pipeline, epoch):
+        """ Record that all the jobs of an epoch's hive database have been archived """
+        with self._transaction() as connection:
+            connection.execute('UPDATE archive_state SET complete_epoch = ? WHERE pipeline = ? AND epoch = ?',
+                               (epoch, pipeline, epoch))
+
+    def first_job_id(self, pipeline, epoch):
+        with self._reading() as connection:
+            return connection.execute('SELECT MIN(job_id) FROM job WHERE pipeline = ? AND epoch = ?',
+                                      (pipeline, epoch)).fetchone()[0]
+
+    def get_input(self, pipeline, epoch, job_id):
+        with self._reading() as connection:
+            row = connection.execute('SELECT result FROM job WHERE pipeline = ? AND epoch = ? AND job_id = ?',
+                                     (pipeline, epoch, job_id)).fetchone()
+        return json.loads(row['result']).get('input') if row is not None else None
+
+    def active_ids(self, pipeline, epoch):
+        """ Ids of the jobs of an epoch which were neither complete nor failed when last synced """
+        with self._reading() as connection:
+            rows = connection.execute(
+                "SELECT job_id FROM job WHERE pipeline = ? AND epoch = ? "
+                "AND result_status NOT IN ('complete', 'failed') ORDER BY job_id", (pipeline, epoch)
+            ).fetchall()
+        return [row['job_id'] for row in rows]
+
+    def store(self, pipeline, epoch, results, statuses):
+        """
+        Add or update the results of jobs of an epoch, with their own status
+        by job_id. Returns how many jobs were added or changed.
+        """
+        now = time.time()
+        changed = 0
+        with self._transaction() as connection:
+            for result in results:
+                job_input = result.get('input') or {}
+                release = job_input.get('ensembl_release')
+                cursor = connection.execute(
+                    'INSERT INTO job (pipeline, epoch, job_id, status, result_status, ensembl_release, tag, '
+                    'environment, result, archived, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (pipeline, epoch, job_id) DO UPDATE SET status = excluded.status, '
+                    'result_status = excluded.result_status, result = excluded.result, updated = excluded.updated '
+                    'WHERE status != excluded.status OR result != excluded.result',
+                    (pipeline, epoch, result['id'], statuses.get(result['id'], result['status']), result['status'],
+                     None if release is None else str(release), job_input.get('tag'), job_input.get('environment'),
+                     json.dumps(result, default=_json_default), now, now)
+                )
+                changed += cursor.rowcount
+            connection.execute(
+                'UPDATE archive_state SET last_job_id = MAX(last_job_id, ?), version = version + ? '
+                'WHERE pipeline = ? AND epoch = ?',
+                (max((result['id'] for result in results), default=0), 1 if changed else 0, pipeline, epoch)
+            )
+        return changed
+
+    def _select(self, columns, pipeline, status=None, ensembl_release=None, tag=None):
+        query = f'SELECT {columns} FROM job WHERE pipeline = ?'
+        params = [pipeline]
+        if status is not None:
+            # Either status name is accepted, as by the hive's job filter
+            from ensembl.production.gifts.hive import HIVE_STATUSES, JOB_STATUSES
+            hive_status = HIVE_STATUSES.get(status.lower(), status.upper())
+            query += ' AND status = ?'
+            params.append(JOB_STATUSES.get(hive_status, hive_status.lower()))
+        for column, value in (('ensembl_release', ensembl_release), ('tag', tag)):
+            if value is not None:
+                query += f' AND {column} = ?'
+                params.append(str(value))
+        return query, params
+
+    def _page(self, query, params, pipeline, limit=None, offset=None, after_job_id=None, order='desc'):
+        if after_job_id is not None:
+            # Job ids refer to the current epoch
+            epoch = self.state(pipeline)['epoch']
+            if order == 'asc':
+                query += ' AND (epoch > ? OR (epoch = ? AND job_id > ?))'
+            else:
+                query += ' AND (epoch < ? OR (epoch = ? AND job_id < ?))'
+            params += [epoch, epoch, after_job_id]
+        direction = 'ASC' if order == 'asc' else 'DESC'
+        query += f' ORDER BY epoch {direction}, job_id {direction}'
+        if limit is not None or offset:
+            query += ' LIMIT ? OFFSET ?'
+            params += [-1 if limit is None else limit, offset or 0]
+        return query, params
+
+    def get_results(self, pipeline, limit=None, offset=None, after_job_id=None, order='desc', status=None,
+                    ensembl_release=None, tag=None):
+        """ One page of archived jobs, selected as by the hive's get_results """
+        query, params = self._select('result', pipeline, status, ensembl_release, tag)
+        query, params = self._page(query, params, pipeline, limit, offset, after_job_id, order)
+        with self._reading() as connection:
+            rows = connection.execute(query, params).fetchall()
+        return [json.loads(row['result']) for row in rows]
+
+    def iter_results(self, pipeline, limit=None, offset=None, after_job_id=None, order='desc', status=None,
+                     ensembl_release=None, tag=None, chunk_size=500):
+        """ Generate the archived jobs selected as in get_results, ``chunk_size`` rows at a time """
+        query, params = self._select('result', pipeline, status, ensembl_release, tag)
+        query, params = self._page(query, params, pipeline, limit, offset, after_job_id, order)
+        with self._reading() as connection:
+            cursor = connection.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                for row in rows:
+                    yield json.loads(row['result'])
+
+    def count_jobs(self, pipeline, status=None, ensembl_release=None, tag=None):
+        query, params = self._select('COUNT(*)', pipeline, status, ensembl_release, tag)
+        with self._reading() as connection:
+            return connection.execute(query, params).fetchone()[0]
+
+    def get_result(self, pipeline, job_id):
+        """ Archived result of a job of the current epoch, or None """
+        epoch = self.state(pipeline)['epoch']
+        with self._reading() as connection:
+            row = connection.execute('SELECT result FROM job WHERE pipeline = ? AND epoch = ? AND job_id = ?',
+                                     (pipeline, epoch, job_id)).fetchone()
+        return json.loads(row['result']) if row is not None else None
+
+    def pipeline(self, pipeline):
+        return ArchivedPipeline(self, pipeline)
+
+
+class ArchivedPipeline:
+    """ Archived jobs of one pipeline, read through the same calls as a hive instance """
+
+    def __init__(self, archive, pipeline):
+        self.archive = archive
+        self.pipeline = pipeline
+
+    def get_results(self, analysis_name, **filters):
+        return self.archive.get_results(self.pipeline, **filters)
+
+    def iter_results(self, analysis_name, **filters):
+        return self.archive.iter_results(self.pipeline, **filters)
+
+    def count_jobs(self, analysis_name, status=None, ensembl_release=None, tag=None):
+        return self.archive.count_jobs(self.pipeline, status, ensembl_release, tag)
+
+    def get_result_for_job_id(self, job_id, progress=False):
+        return self.archive.get_result(self.pipeline, job_id)
+
+
+class ArchiveSync:
+    """
+    Copies new jobs, and the jobs which were still active, from the hive of
+    each pipeline into the archive, in the background every ``interval``
+    seconds and on reads of a pipeline last synced more than ``max_staleness``
+    seconds ago. Only one process syncs a pipeline at a time.
+
+    A hive database is taken to have been reseeded when its earliest job, from
+    the first one archived on, is not in the archive with the same input: job
+    ids restart in a reseeded database, whereas deleting jobs only leaves
+    gaps. Its jobs are then archived in a new epoch.
+    """
+
+    def __init__(self, archive, hive_factory, analyses, interval=30, max_staleness=5, chunk_size=500):
+        self.archive = archive
+        self.hive_factory = hive_factory
+        self.analyses = analyses
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self.chunk_size = chunk_size
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def start(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # The syncing thread does not survive a fork
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='gifts-archive', daemon=True).start()
+
+    def notify(self):
+        """ Sync now rather than at the next interval """
+        self.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            # Unless woken up, leave pipelines another process has just synced
+            max_age = 0 if self._wake.is_set() else self.interval / 2
+            for pipeline in self.analyses:
+                try:
+                    self.sync(pipeline, max_age=max_age)
+                except Exception as e:
+                    logger.error(f'Unable to archive {pipeline} jobs: {e}')
+            self._wake.clear()
+            self._wake.wait(self.interval)
+
+    def refresh(self, pipeline):
+        """ Sync a pipeline if it is stale, leaving the archive as it is if its hive cannot be read """
+        try:
+            self.sync(pipeline, max_age=self.max_staleness)
+        except Exception as e:
+            logger.warning(f'Serving archived {pipeline} jobs, unable to sync them: {e}')
+
+    def _was_reseeded(self, hive, pipeline, epoch):
+        first_job_id = self.archive.first_job_id(pipeline, epoch)
+        if first_job_id is None:
+            return False
+        jobs = hive.iter_job_inputs(self.analyses[pipeline], after_job_id=first_job_id - 1, chunk_size=1)
+        try:
+            job = next(jobs, None)
+        finally:
+            jobs.close()
+        return job is None or job[2] != self.archive.get_input(pipeline, epoch, job[0])
+
+    def _store(self, hive, pipeline, epoch, results):
+        statuses = hive.get_job_statuses([result['id'] for result in results])
+        return self.archive.store(pipeline, epoch, results, statuses)
+
+    def sync(self, pipeline, max_age=0):
+        """
+        Archive the new and active jobs of a pipeline, unless it was synced
+        less than ``max_age`` seconds ago. Returns how many jobs were added or
+        changed, or None if not synced.
+        """
+        state = self.archive.claim_sync(pipeline, max_age)
+        if state is None:
+            return None
+        hive = self.hive_factory(pipeline)
+        # Results of active jobs cached by the hive instance are kept for this version only
+        hive.get_version()
+        epoch, last_job_id = state['epoch'], state['last_job_id']
+        if last_job_id and self._was_reseeded(hive, pipeline, epoch):
+            epoch, last_job_id = self.archive.new_epoch(pipeline), 0
+            # Results cached for the old database's jobs are not to be archived under their reused job_ids
+            hive.clear_result_cache()
+            logger.warning(f'The {pipeline} hive database was reseeded, archiving its jobs as epoch {epoch}')
+
+        changed = 0
+        active = self.archive.active_ids(pipeline, epoch)
+        for start in range(0, len(active), self.chunk_size):
+            results = hive.get_results_for_job_ids(active[start:start + self.chunk_size])
+            if results:
+                changed += self._store(hive, pipeline, epoch, list(results.values()))
+
+        batch = []
+        for result in hive.iter_results(self.analyses[pipeline], after_job_id=last_job_id, order='asc',
+                                        chunk_size=self.chunk_size):
+            batch.append(result)
+            if len(batch) >= self.chunk_size:
+                changed += self._store(hive, pipeline, epoch, batch)
+                batch = []
+        if batch:
+            changed += self._store(hive, pipeline, epoch, batch)
+        if state['complete_epoch'] != epoch:
+            self.archive.complete_epoch(pipeline, epoch)
+        return changed
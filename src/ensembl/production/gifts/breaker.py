@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import inspect
+import logging
+import os
+import threading
+import time
+from functools import wraps
+
+from ensembl.production.gifts.metrics import CIRCUIT_TRANSITIONS
+
+__all__ = ['CircuitOpenError', 'CircuitBreaker', 'CircuitBreakers', 'GuardedHive']
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+
+
+class CircuitOpenError(Exception):
+    """ A backend is known to be down, the call was not attempted """
+
+    def __init__(self, backend, error, retry_after):
+        super().__init__(f'{backend} is unavailable: {error}')
+        self.backend = backend
+        self.error = error
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one backend.
+
+    After ``failure_threshold`` consecutive failures, i.e. exceptions for
+    which ``is_failure`` is true, the circuit opens: calls fail immediately
+    with CircuitOpenError instead of waiting on the backend. While open, a
+    background thread runs ``probe`` every ``probe_interval`` seconds and
+    closes the circuit once it succeeds. State is kept per process.
+
+    Generators only call the backend as they are iterated, so the errors
+    raised while iterating the generator returned by a call count instead.
+    """
+
+    def __init__(self, name, probe, is_failure=lambda e: True, failure_threshold=3, probe_interval=10):
+        self.name = name
+        self.probe = probe
+        self.is_failure = is_failure
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.last_error = None
+        self.opened = None
+        self.last_probe = None
+        self._pid = os.getpid()
+
+    def _check_process(self):
+        # Neither the state nor the probing thread belong to a forked worker
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    @property
+    def retry_after(self):
+        if self.last_probe is None:
+            return self.probe_interval
+        return max(1, int(self.probe_interval - (time.monotonic() - self.last_probe)) + 1)
+
+    def call(self, func, *args, **kwargs):
+        self._check_process()
+        if self.state == OPEN:
+            raise CircuitOpenError(self.name, self.last_error, self.retry_after)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure(e)
+            raise
+        if inspect.isgenerator(result):
+            return self._iterate(result)
+        self._record_success()
+        return result
+
+    def _iterate(self, generator):
+        try:
+            yield from generator
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure(e)
+            raise
+        self._record_success()
+
+    def _record_success(self):
+        if self.failures:
+            with self._lock:
+                self.failures = 0
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state == OPEN or self.failures < self.failure_threshold:
+                return
+            self.state = OPEN
+            self.opened = time.monotonic()
+            self.last_probe = self.opened
+        CIRCUIT_TRANSITIONS.labels(self.name, OPEN).inc()
+        logger.error(f'Circuit for {self.name} opened after {self.failures} failures: {error}')
+        threading.Thread(target=self._probe, name=f'gifts-breaker-{self.name}', daemon=True).start()
+
+    def _probe(self):
+        pid = self._pid
+        while self.state == OPEN and self._pid == pid:
+            time.sleep(self.probe_interval)
+            self.last_probe = time.monotonic()
+            try:
+                self.probe()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f'Probe of {self.name} failed: {e}')
+                continue
+            with self._lock:
+                if self._pid != pid:
+                    return
+                downtime = time.monotonic() - self.opened
+                self.state = CLOSED
+                self.failures = 0
+                self.opened = None
+            CIRCUIT_TRANSITIONS.labels(self.name, CLOSED).inc()
+            logger.info(f'Circuit for {self.name} closed after {downtime:.1f}s')
+
+    def status(self):
+        self._check_process()
+        status = {'state': self.state, 'failures': self.failures, 'last_error': self.last_error}
+        if self.state == OPEN:
+            status['open_for'] = round(time.monotonic() - self.opened, 3)
+            status['retry_after'] = self.retry_after
+        return status
+
+
+class CircuitBreakers:
+    """ Circuit breakers created on first use, one per backend key """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(key, self.factory(key))
+        return breaker
+
+    def items(self):
+        return list(self._breakers.items())
+
+
+class GuardedHive:
+    """ Proxy to a hive instance making every call through a circuit breaker """
+
+    def __init__(self, hive, breaker):
+        self._hive = hive
+        self._breaker = breaker
+
+    def __getattr__(self, name):
+        attr = getattr(self._hive, name)
+        if not callable(attr):
+            return attr
+
+        @wraps(attr)
+        def guarded(*args, **kwargs):
+            return self._breaker.call(attr, *args, **kwargs)
+        return guarded
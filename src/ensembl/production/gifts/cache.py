@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import threading
+import time
+from collections import OrderedDict
+
+from ensembl.production.gifts.metrics import CACHE_REQUESTS
+
+__all__ = ['LRUCache']
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with optional per-entry TTL.
+
+    Any object with the same ``get``/``set``/``delete``/``clear`` methods can
+    be used in its place, e.g. to share entries between gunicorn workers.
+    """
+
+    def __init__(self, name, maxsize=1024):
+        self.name = name
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """ Cached value for key, or None if absent or expired """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        CACHE_REQUESTS.labels(self.name, 'miss' if entry is None else 'hit').inc()
+        return None if entry is None else entry[1]
+
+    def set(self, key, value, ttl=None):
+        """ Cache value for key, for ttl seconds or until evicted if ttl is None """
+        expires = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
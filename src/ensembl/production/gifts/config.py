@@ -11,7 +11,7 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 import os
-import pkg_resources
+from importlib import metadata
 from pathlib import Path
 from ensembl.production.core.config import load_config_yaml
 
@@ -21,7 +21,7 @@ file_config = load_config_yaml(config_file_path)
 
 def get_app_version():
     try:
-        version = pkg_resources.require("gifts")[0].version
+        version = metadata.version("gifts")
     except Exception as e:
         with open(Path(__file__).parents[4] / 'VERSION') as f:
             version = f.read()
@@ -38,6 +38,103 @@ class GIFTsConfig:
                                               file_config.get('hive_process_mapping_uri', None))
     GIFTS_API_URIS_FILE = os.environ.get("GIFTS_APIS_URIS_FILE",
                                          file_config.get('gifts_api_uris_file', 'gifts_api_uris.json'))
+    GIFTS_API_URIS_CHECK_INTERVAL = float(os.environ.get("GIFTS_API_URIS_CHECK_INTERVAL",
+                                                         file_config.get('gifts_api_uris_check_interval', 1.0)))
+    GIFTS_STATUS_CONNECT_TIMEOUT = float(os.environ.get("GIFTS_STATUS_CONNECT_TIMEOUT",
+                                                        file_config.get('gifts_status_connect_timeout', 3.05)))
+    GIFTS_STATUS_READ_TIMEOUT = float(os.environ.get("GIFTS_STATUS_READ_TIMEOUT",
+                                                     file_config.get('gifts_status_read_timeout', 5)))
+    GIFTS_STATUS_RETRIES = int(os.environ.get("GIFTS_STATUS_RETRIES",
+                                              file_config.get('gifts_status_retries', 1)))
+    GIFTS_STATUS_BACKOFF = float(os.environ.get("GIFTS_STATUS_BACKOFF",
+                                                file_config.get('gifts_status_backoff', 0.5)))
+    # Below the 30s gunicorn timeout, leaving time for the rest of the request
+    GIFTS_STATUS_MAX_DURATION = float(os.environ.get("GIFTS_STATUS_MAX_DURATION",
+                                                     file_config.get('gifts_status_max_duration', 20)))
+    GIFTS_STATUS_CACHE_TTL = float(os.environ.get("GIFTS_STATUS_CACHE_TTL",
+                                                  file_config.get('gifts_status_cache_ttl', 10)))
+    GIFTS_STATUS_POLL_INTERVAL = float(os.environ.get("GIFTS_STATUS_POLL_INTERVAL",
+                                                      file_config.get('gifts_status_poll_interval', 10)))
+    GIFTS_STATUS_MAX_STALENESS = float(os.environ.get("GIFTS_STATUS_MAX_STALENESS",
+                                                      file_config.get('gifts_status_max_staleness', 30)))
+    JOB_TERMINAL_MAX_AGE = int(os.environ.get("JOB_TERMINAL_MAX_AGE",
+                                              file_config.get('job_terminal_max_age', 86400)))
+    JOB_EVENTS_INTERVAL = float(os.environ.get("JOB_EVENTS_INTERVAL",
+                                               file_config.get('job_events_interval', 2.0)))
+    JOB_EVENTS_HEARTBEAT = float(os.environ.get("JOB_EVENTS_HEARTBEAT",
+                                                file_config.get('job_events_heartbeat', 15)))
+    # Sync gunicorn workers would be held, then killed, by long-lived streams
+    JOB_EVENTS_STREAMING = str(os.environ.get("JOB_EVENTS_STREAMING", file_config.get(
+        'job_events_streaming', os.environ.get("GUNICORN_WORKER_CLASS", "sync") != "sync"))).lower() in \
+        ('true', '1', 'yes')
+    JOB_EVENTS_TIMEOUT = float(os.environ.get("JOB_EVENTS_TIMEOUT",
+                                              file_config.get('job_events_timeout', 300)))
+    JOB_EVENTS_CACHE_SIZE = int(os.environ.get("JOB_EVENTS_CACHE_SIZE",
+                                               file_config.get('job_events_cache_size', 1024)))
+    SUBMIT_BATCH_MAX_SIZE = int(os.environ.get("SUBMIT_BATCH_MAX_SIZE",
+                                               file_config.get('submit_batch_max_size', 100)))
+    JOBS_MAX_IDS = int(os.environ.get("JOBS_MAX_IDS",
+                                      file_config.get('jobs_max_ids', 500)))
+    RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE",
+                                           file_config.get('result_cache_size', 10000)))
+    RESULT_CACHE_ACTIVE_TTL = float(os.environ.get("RESULT_CACHE_ACTIVE_TTL",
+                                                   file_config.get('result_cache_active_ttl', 5)))
+    LIST_CACHE_SIZE = int(os.environ.get("LIST_CACHE_SIZE",
+                                         file_config.get('list_cache_size', 256)))
+    LIST_CACHE_TTL = float(os.environ.get("LIST_CACHE_TTL",
+                                          file_config.get('list_cache_ttl', 10)))
+    OVERVIEW_STATUS_TIMEOUT = float(os.environ.get("OVERVIEW_STATUS_TIMEOUT",
+                                                   file_config.get('overview_status_timeout', 5)))
+    OVERVIEW_HIVE_TIMEOUT = float(os.environ.get("OVERVIEW_HIVE_TIMEOUT",
+                                                 file_config.get('overview_hive_timeout', 10)))
+    OVERVIEW_MAX_WORKERS = int(os.environ.get("OVERVIEW_MAX_WORKERS",
+                                              file_config.get('overview_max_workers', 16)))
+    SUMMARY_REBUILD_INTERVAL = int(os.environ.get("SUMMARY_REBUILD_INTERVAL",
+                                                  file_config.get('summary_rebuild_interval', 3600)))
+    SUBMISSION_QUEUE_FILE = os.environ.get("SUBMISSION_QUEUE_FILE",
+                                           file_config.get('submission_queue_file', None))
+    SUBMISSION_BATCH_SIZE = int(os.environ.get("SUBMISSION_BATCH_SIZE",
+                                               file_config.get('submission_batch_size', 100)))
+    SUBMISSION_DRAIN_INTERVAL = float(os.environ.get("SUBMISSION_DRAIN_INTERVAL",
+                                                     file_config.get('submission_drain_interval', 1.0)))
+    SUBMISSION_IDEMPOTENCY_TTL = int(os.environ.get("SUBMISSION_IDEMPOTENCY_TTL",
+                                                    file_config.get('submission_idempotency_ttl', 86400)))
+    PROFILE_HEADER = os.environ.get("PROFILE_HEADER",
+                                    file_config.get('profile_header', None))
+    PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE",
+                                               file_config.get('profile_sample_rate', 0.0)))
+    PROFILE_DIR = os.environ.get("PROFILE_DIR",
+                                 file_config.get('profile_dir', None))
+    SLOW_REQUEST_THRESHOLD = float(os.environ.get("SLOW_REQUEST_THRESHOLD",
+                                                  file_config.get('slow_request_threshold', 5.0)))
+    BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD",
+                                                   file_config.get('breaker_failure_threshold', 3)))
+    BREAKER_PROBE_INTERVAL = float(os.environ.get("BREAKER_PROBE_INTERVAL",
+                                                  file_config.get('breaker_probe_interval', 10)))
+    LAST_KNOWN_CACHE_SIZE = int(os.environ.get("LAST_KNOWN_CACHE_SIZE",
+                                               file_config.get('last_known_cache_size', 128)))
+    RATE_LIMIT_RATE = float(os.environ.get("RATE_LIMIT_RATE",
+                                           file_config.get('rate_limit_rate', 0)))
+    RATE_LIMIT_BURST = int(os.environ.get("RATE_LIMIT_BURST",
+                                          file_config.get('rate_limit_burst', 20)))
+    RATE_LIMIT_CLIENT_HEADER = os.environ.get("RATE_LIMIT_CLIENT_HEADER",
+                                              file_config.get('rate_limit_client_header', None))
+    ARCHIVE_FILE = os.environ.get("ARCHIVE_FILE",
+                                  file_config.get('archive_file', None))
+    ARCHIVE_SYNC_INTERVAL = float(os.environ.get("ARCHIVE_SYNC_INTERVAL",
+                                                 file_config.get('archive_sync_interval', 30)))
+    ARCHIVE_MAX_STALENESS = float(os.environ.get("ARCHIVE_MAX_STALENESS",
+                                                 file_config.get('archive_max_staleness', 5)))
+    HIVE_POOL_SIZE = int(os.environ.get("HIVE_POOL_SIZE",
+                                        file_config.get('hive_pool_size', 5)))
+    HIVE_MAX_OVERFLOW = int(os.environ.get("HIVE_MAX_OVERFLOW",
+                                           file_config.get('hive_max_overflow', 10)))
+    HIVE_POOL_TIMEOUT = int(os.environ.get("HIVE_POOL_TIMEOUT",
+                                           file_config.get('hive_pool_timeout', 30)))
+    HIVE_POOL_RECYCLE = int(os.environ.get("HIVE_POOL_RECYCLE",
+                                           file_config.get('hive_pool_recycle', 3600)))
+    HIVE_POOL_PRE_PING = str(os.environ.get("HIVE_POOL_PRE_PING",
+                                            file_config.get('hive_pool_pre_ping', True))).lower() in ('true', '1', 'yes')
     
     APP_VERSION = get_app_version()
     SCRIPT_NAME = os.environ.get('SCRIPT_NAME', '')
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import logging
+import os
+import queue
+import threading
+
+__all__ = ['JobPoller', 'JobPollers']
+
+logger = logging.getLogger(__name__)
+
+
+class JobPoller:
+    """
+    Single polling loop over one hive database, shared by every subscriber.
+
+    Each round fetches all the watched jobs with one query and pushes a job's
+    result to its subscribers' queues only when it differs from the last one
+    seen. A job that does not exist is pushed as None.
+    """
+
+    def __init__(self, hive_factory, interval=2.0):
+        self.hive_factory = hive_factory
+        self.interval = interval
+        self.polls = 0
+        self._subscribers = {}
+        self._last = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def subscribe(self, job_id):
+        subscriber = queue.Queue()
+        with self._lock:
+            self._subscribers.setdefault(job_id, set()).add(subscriber)
+            if job_id in self._last:
+                subscriber.put(self._last[job_id])
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='gifts-job-poller', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return subscriber
+
+    def unsubscribe(self, job_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(job_id, set())
+            subscribers.discard(subscriber)
+            if not subscribers:
+                self._subscribers.pop(job_id, None)
+                self._last.pop(job_id, None)
+
+    def poll(self):
+        with self._lock:
+            job_ids = list(self._subscribers)
+        if not job_ids:
+            return
+        results = self.hive_factory().get_results_for_job_ids(job_ids, progress=True)
+        self.polls += 1
+        with self._lock:
+            for job_id in job_ids:
+                result = results.get(job_id)
+                if job_id in self._last and self._last[job_id] == result:
+                    continue
+                self._last[job_id] = result
+                for subscriber in self._subscribers.get(job_id, ()):
+                    subscriber.put(result)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f'Unable to poll hive for job progress: {e}')
+
+
+class JobPollers:
+    """ One JobPoller per pipeline type, recreated in forked processes """
+
+    def __init__(self, hive_getter, interval=2.0):
+        self.hive_getter = hive_getter
+        self.interval = interval
+        self._pollers = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def get(self, hive_type):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Polling threads do not survive a fork
+                self._pollers = {}
+                self._pid = os.getpid()
+            poller = self._pollers.get(hive_type)
+            if poller is None:
+                poller = JobPoller(lambda: self.hive_getter(hive_type), self.interval)
+                self._pollers[hive_type] = poller
+        return poller
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+__all__ = ['FanOut']
+
+
+def _timed(call):
+    start = time.monotonic()
+    try:
+        return call(), None, time.monotonic() - start
+    except Exception as e:
+        return None, e, time.monotonic() - start
+
+
+class FanOut:
+    """
+    Runs independent backend calls concurrently on a thread pool, each with
+    its own timeout, so that a set of calls takes as long as the slowest one
+    (or its timeout) rather than the sum of them all.
+
+    A call still running when its timeout expires is reported as timed out and
+    left to finish in the background. The pool is recreated in forked
+    processes.
+    """
+
+    def __init__(self, max_workers=16):
+        self.max_workers = max_workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='gifts-fanout')
+                self._pid = os.getpid()
+            return self._executor
+
+    def run(self, calls):
+        """
+        Run ``calls``, a dict of ``(callable, timeout)`` by name. Returns a dict
+        by name with either the callable's ``result`` or an ``error``, and the
+        ``elapsed`` seconds.
+        """
+        start = time.monotonic()
+        executor = self.executor
+        futures = {name: (executor.submit(_timed, call), timeout) for name, (call, timeout) in calls.items()}
+        results = {}
+        for name, (future, timeout) in futures.items():
+            try:
+                result, error, elapsed = future.result(timeout=max(0.0, start + timeout - time.monotonic()))
+            except FutureTimeoutError:
+                results[name] = {'error': f'Timed out after {timeout}s', 'elapsed': round(timeout, 3)}
+                continue
+            if error is not None:
+                results[name] = {'error': str(error), 'elapsed': round(elapsed, 3)}
+            else:
+                results[name] = {'result': result, 'elapsed': round(elapsed, 3)}
+        return results
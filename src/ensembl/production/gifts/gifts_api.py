@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import json
+import logging
+import os
+import threading
+import time
+from json.decoder import JSONDecodeError
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ensembl.production.gifts.metrics import CACHE_REQUESTS, GIFTS_API_URIS_READS, GIFTS_STATUS_ERRORS, \
+    GIFTS_STATUS_LATENCY
+from ensembl.production.gifts.profiling import timed
+
+__all__ = ['GIFTsApiUris', 'GIFTsServiceError', 'GIFTsStatusClient', 'GIFTsStatusPoller', 'running_pipeline']
+
+logger = logging.getLogger(__name__)
+
+
+class GIFTsApiUris:
+    """
+    In-memory map of environment to GIFTs REST server, loaded from a JSON file.
+
+    The file is only read again when its inode, mtime or size change, checked
+    at most once every ``check_interval`` seconds. A reload that fails (e.g. a
+    half-written file during a rollout) is logged and the last good map keeps
+    being served.
+    """
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.failed_reloads = 0
+        self._uris = None
+        self._stamp = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _file_stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _reload(self, stamp):
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            try:
+                with open(self.path, 'r') as f:
+                    uris = json.load(f)
+                if not isinstance(uris, dict):
+                    raise ValueError('Expected a JSON object mapping environments to URIs')
+            except (OSError, ValueError) as e:
+                if self._uris is None:
+                    raise
+                self.failed_reloads += 1
+                GIFTS_API_URIS_READS.labels('failed').inc()
+                logger.error(f'Unable to reload GIFTs API URIs from {self.path}, keeping previous map: {e}')
+                return
+            # Swap the reference, readers see either the old or the new map
+            self._uris = uris
+            self._stamp = stamp
+            self.reloads += 1
+            GIFTS_API_URIS_READS.labels('loaded').inc()
+            logger.info(f'Loaded GIFTs API URIs from {self.path}: {", ".join(sorted(uris))}')
+
+    def uris(self):
+        now = time.monotonic()
+        if self._uris is None or now - self._checked >= self.check_interval:
+            self._checked = now
+            try:
+                stamp = self._file_stamp()
+            except OSError as e:
+                if self._uris is None:
+                    raise
+                logger.error(f'Unable to stat GIFTs API URIs file {self.path}, keeping previous map: {e}')
+            else:
+                if stamp != self._stamp:
+                    self._reload(stamp)
+        return self._uris
+
+    def resolve(self, environment):
+        uris = self.uris()
+        if environment not in uris:
+            raise RuntimeError('Unrecognised Environment: %s' % environment)
+        return uris[environment]
+
+
+class GIFTsServiceError(Exception):
+    """ The GIFTs service status could not be retrieved or understood """
+
+
+def running_pipeline(pipeline_status):
+    """ Name of the first running pipeline in a GIFTs service status, or None if all are idle """
+    for status, running in pipeline_status.items():
+        if running:
+            return status.replace('_', ' ').capitalize()
+    return None
+
+
+class GIFTsStatusClient:
+    """
+    Client for the ``/service/status`` endpoint of GIFTs REST servers.
+
+    Requests go through one keep-alive session per process, with connect and
+    read timeouts and retries with exponential backoff. Retries, then the
+    read timeout, are reduced so that a check of an unresponsive server
+    gives up within ``max_duration`` seconds. The parsed pipeline status is
+    cached per REST server for ``cache_ttl`` seconds; failures are not cached.
+    """
+
+    def __init__(self, connect_timeout=3.05, read_timeout=5, retries=1, backoff_factor=0.5, cache_ttl=10,
+                 pool_maxsize=10, max_duration=20):
+        configured = (read_timeout, retries)
+        while retries and self.worst_case(connect_timeout, read_timeout, retries, backoff_factor) > max_duration:
+            retries -= 1
+        if connect_timeout + read_timeout > max_duration:
+            read_timeout = max(max_duration - connect_timeout, 1)
+        if (read_timeout, retries) != configured:
+            logger.warning(f'GIFTs status checks limited to {max_duration}s: read timeout {read_timeout:g}s, '
+                           f'{retries} retries')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.cache_ttl = cache_ttl
+        self.pool_maxsize = pool_maxsize
+        self._cache = {}
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def worst_case(connect_timeout, read_timeout, retries, backoff_factor):
+        """ Seconds a check can take when every attempt times out """
+        # urllib3 does not sleep before the first retry, then doubles the backoff
+        backoff = sum(backoff_factor * 2 ** (retry - 1) for retry in range(2, retries + 1))
+        return (retries + 1) * (connect_timeout + read_timeout) + backoff
+
+    @property
+    def session(self):
+        # Never share pooled sockets with a parent process
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    retry = Retry(total=self.retries, backoff_factor=self.backoff_factor,
+                                  status_forcelist=(502, 503, 504), allowed_methods=frozenset(['GET']),
+                                  raise_on_status=False)
+                    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=self.pool_maxsize)
+                    session = requests.Session()
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+                    self._pid = os.getpid()
+                    self._cache = {}
+        return self._session
+
+    def fetch_status(self, rest_server):
+        """ Retrieve the pipeline status from the GIFTs service, bypassing the cache """
+        status_uri = f'{rest_server}/service/status'
+        try:
+            with GIFTS_STATUS_LATENCY.time(), timed('http'):
+                status_response = self.session.get(status_uri, timeout=self.timeout)
+        except requests.RequestException as e:
+            GIFTS_STATUS_ERRORS.inc()
+            raise GIFTsServiceError(f'Unable to retrieve status from GIFTs service {e}') from e
+        try:
+            pipeline_status = json.loads(status_response.text)
+        except JSONDecodeError as e:
+            GIFTS_STATUS_ERRORS.inc()
+            raise GIFTsServiceError(f'Error loading GIFTs service information {e}') from e
+        if not isinstance(pipeline_status, dict):
+            GIFTS_STATUS_ERRORS.inc()
+            raise GIFTsServiceError(f'Error loading GIFTs service information: {status_response.text}')
+        self._cache[rest_server] = (time.monotonic(), pipeline_status)
+        return pipeline_status
+
+    def cached_status(self, rest_server):
+        """
+        Return ``(pipeline_status, age)`` from the cache, or None if there is
+        no entry younger than the TTL
+        """
+        entry = self._cache.get(rest_server)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.cache_ttl:
+                return entry[1], age
+        return None
+
+    def last_status(self, rest_server):
+        """
+        Return ``(pipeline_status, age)`` of the last status retrieved from the
+        REST server however old, or None if it never answered
+        """
+        entry = self._cache.get(rest_server)
+        if entry is None:
+            return None
+        return entry[1], time.monotonic() - entry[0]
+
+    def get_status(self, rest_server):
+        """ Return ``(pipeline_status, age)``, from the cache if fresh enough """
+        cached = self.cached_status(rest_server)
+        if cached is not None:
+            CACHE_REQUESTS.labels('gifts_status', 'hit').inc()
+            return cached
+        CACHE_REQUESTS.labels('gifts_status', 'miss').inc()
+        return self.fetch_status(rest_server), 0.0
+
+
+class GIFTsStatusPoller:
+    """
+    Background threads keeping a snapshot of the pipeline status of every
+    GIFTs REST server in the URI map, one thread per server.
+
+    Threads are started on first use in each process and follow changes to
+    the URI map. A snapshot records either the pipeline status or the error
+    from the last poll, and when it was taken.
+    """
+
+    def __init__(self, client, uris, interval=10):
+        self.client = client
+        self.uris = uris
+        self.interval = interval
+        self._snapshots = {}
+        self._threads = {}
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _sync(self):
+        try:
+            servers = set(self.uris.uris().values())
+        except (OSError, ValueError) as e:
+            logger.error(f'Unable to read GIFTs API URIs for status polling: {e}')
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Polling threads do not survive a fork
+                self._threads = {}
+                self._snapshots = {}
+                self._pid = os.getpid()
+            for rest_server in servers - set(self._threads):
+                stop = threading.Event()
+                threading.Thread(target=self._poll, args=(rest_server, stop), name=f'gifts-status-{rest_server}',
+                                 daemon=True).start()
+                self._threads[rest_server] = stop
+            for rest_server in set(self._threads) - servers:
+                self._threads.pop(rest_server).set()
+                self._snapshots.pop(rest_server, None)
+
+    def _poll(self, rest_server, stop):
+        while not stop.is_set():
+            try:
+                pipeline_status, error = self.client.fetch_status(rest_server), None
+            except GIFTsServiceError as e:
+                pipeline_status, error = None, str(e)
+            if not stop.is_set():
+                self._snapshots[rest_server] = (time.monotonic(), pipeline_status, error)
+            stop.wait(self.interval)
+
+    def snapshot(self, rest_server):
+        """
+        Return ``(pipeline_status, error, age)`` from the last poll of the
+        REST server, or None if it has not been polled yet
+        """
+        self._sync()
+        entry = self._snapshots.get(rest_server)
+        if entry is None:
+            return None
+        checked, pipeline_status, error = entry
+        return pipeline_status, error, time.monotonic() - checked
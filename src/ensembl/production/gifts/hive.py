@@ -0,0 +1,504 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import logging
+import os
+import re
+import time
+
+from sqlalchemy import create_engine, event, exc, func, or_
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+from ensembl.production.core.models.hive import Analysis, AnalysisData, Job, Semaphore
+from ensembl.production.core.perl_utils import dict_to_perl_string, perl_string_to_python
+from ensembl.production.gifts.profiling import after_cursor_execute, before_cursor_execute
+
+__all__ = ['PooledHiveInstance', 'HIVE_STATUSES', 'JOB_STATUSES']
+
+logger = logging.getLogger(__name__)
+
+# Job status as reported by this service, mapped to the hive job.status column
+HIVE_STATUSES = {
+    'complete': 'DONE',
+    'failed': 'FAILED',
+    'submitted': 'READY',
+    'running': 'RUN',
+    'semaphored': 'SEMAPHORED',
+}
+
+# Service status names for a job's own hive status
+JOB_STATUSES = {hive_status: status for status, hive_status in HIVE_STATUSES.items()}
+
+
+def _guard_fork(engine):
+    """
+    Invalidate pooled connections inherited from another process, so that a
+    forked worker never shares a MySQL socket with its parent.
+    """
+    @event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        connection_record.info['pid'] = os.getpid()
+
+    @event.listens_for(engine, 'checkout')
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        pid = os.getpid()
+        if connection_record.info['pid'] != pid:
+            connection_record.dbapi_connection = connection_proxy.dbapi_connection = None
+            raise exc.DisconnectionError(
+                'Connection record belongs to pid %s, attempting to check out in pid %s' %
+                (connection_record.info['pid'], pid)
+            )
+
+
+class PooledHiveInstance:
+    """
+    Hive database access with its own engine and session factory.
+
+    The core HiveInstance binds a module-level sessionmaker, so two instances
+    (one per pipeline) cannot live side by side in the same process. The
+    calls used by this service are implemented here against ``self.Session``
+    instead, rather than inheriting the core ones which would run against
+    the module-level sessionmaker.
+    """
+
+    def __init__(self, url, pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=3600, pool_pre_ping=True,
+                 result_cache=None, active_result_ttl=5):
+        engine_options = {'pool_recycle': pool_recycle, 'pool_pre_ping': pool_pre_ping, 'echo': False}
+        if not make_url(url).drivername.startswith('sqlite'):
+            engine_options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+        self.url = url
+        self.engine = create_engine(url, **engine_options)
+        _guard_fork(self.engine)
+        # Time each statement for the profiling of the request running it
+        event.listen(self.engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(self.engine, 'after_cursor_execute', after_cursor_execute)
+        self.Session = sessionmaker(bind=self.engine)
+        # Results of complete or failed jobs never change, others are cached
+        # briefly and only for the version token they were read at. Entries
+        # are only served for the same job row, and dropped if the hive is
+        # reseeded, as job_ids are then reused.
+        self.result_cache = result_cache
+        self.active_result_ttl = active_result_ttl
+        self.version = None
+        self.last_job_id = None
+
+    def clear_result_cache(self):
+        if self.result_cache is not None:
+            self.result_cache.clear()
+
+    def dispose(self):
+        self.engine.dispose()
+
+    def get_job_by_id(self, id):
+        """ Retrieve a job given the unique surrogate ID """
+        s = self.Session()
+        try:
+            job = s.query(Job).filter(Job.job_id == id).first()
+            if job is None:
+                raise ValueError("Job %s not found" % id)
+            return job
+        finally:
+            s.close()
+
+    def get_analysis_by_name(self, name):
+        """ Find an analysis """
+        s = self.Session()
+        try:
+            return s.query(Analysis).filter(Analysis.logic_name == name).first()
+        finally:
+            s.close()
+
+    def create_job(self, analysis_name, input_data):
+        """
+        Create a job for the supplied analysis and input hash
+        The input_data dict is converted to a Perl string before storing
+        """
+        input_data['timestamp'] = time.ctime()
+        analysis = self.get_analysis_by_name(analysis_name)
+        if analysis is None:
+            raise ValueError("Analysis %s not found" % analysis_name)
+        s = self.Session()
+        try:
+            job = Job(input_id=dict_to_perl_string(input_data), status='READY', analysis_id=analysis.analysis_id)
+            s.add(job)
+            s.commit()
+            # force load of object before the session is closed
+            job.analysis
+            job.result
+            return job
+        except exc.SQLAlchemyError:
+            s.rollback()
+            raise
+        finally:
+            s.close()
+
+    def create_jobs(self, analysis_name, inputs):
+        """
+        Create one job per input hash for the supplied analysis, in a single
+        transaction: either all the jobs are created or none are
+        """
+        analysis = self.get_analysis_by_name(analysis_name)
+        if analysis is None:
+            raise ValueError("Analysis %s not found" % analysis_name)
+        timestamp = time.ctime()
+        s = self.Session()
+        try:
+            jobs = []
+            for input_data in inputs:
+                input_data['timestamp'] = timestamp
+                jobs.append(Job(input_id=dict_to_perl_string(input_data), status='READY',
+                                analysis_id=analysis.analysis_id))
+            s.add_all(jobs)
+            # Ids are assigned by the flush, reading them after the commit would reload each job
+            s.flush()
+            job_ids = [job.job_id for job in jobs]
+            s.commit()
+            return job_ids
+        except exc.SQLAlchemyError:
+            s.rollback()
+            raise
+        finally:
+            s.close()
+
+    def get_analysis_data_input(self, analysis_data_id):
+        """ Get the job input stored in the analysis_data table """
+        s = self.Session()
+        try:
+            return s.query(AnalysisData).filter(AnalysisData.analysis_data_id == analysis_data_id).first()
+        finally:
+            s.close()
+
+    def get_semaphore_data(self, semaphore_job_id):
+        """ Get the job semaphore count if exist """
+        s = self.Session()
+        try:
+            return s.query(Semaphore).filter(Semaphore.dependent_job_id == semaphore_job_id).first()
+        finally:
+            s.close()
+
+    def get_all_jobs_progress(self, job_id, analysis_id=None):
+        """ Get progress counts of all jobs descending from the given job id """
+        s = self.Session()
+        try:
+            results = {'total': 0, 'inprogress': 0, 'completed': 0, 'failed': 0}
+            # A plain prefix LIKE can use an index on param_id_stack, unlike ilike's lower()
+            query = s.query(Job.status, func.count()).filter(Job.param_id_stack.like(f"{job_id},%"))
+            if analysis_id:
+                query = query.filter(Job.analysis_id == analysis_id)
+            for status, count in query.group_by(Job.status).all():
+                results['total'] += count
+                if status == 'DONE':
+                    results['completed'] += count
+                elif status == 'FAILED':
+                    results['failed'] += count
+                else:
+                    results['inprogress'] += count
+            return results
+        except exc.SQLAlchemyError:
+            return results
+        finally:
+            s.close()
+
+    def get_job_tree_status(self, job):
+        """ Recursively check all children of a job """
+        s = self.Session()
+        try:
+            semaphore_data = None
+            semaphored_job = s.query(Job).filter(Job.prev_job_id == job.job_id).first()
+            if semaphored_job is not None:
+                semaphore_data = self.get_semaphore_data(semaphored_job.job_id)
+            if semaphore_data is not None and semaphore_data.local_jobs_counter > 0:
+                return self.check_semaphores_for_job(semaphore_data)
+            if job.status == 'FAILED':
+                return 'failed'
+            elif job.status == 'READY':
+                return 'submitted'
+            elif job.status == 'RUN':
+                return 'running'
+            elif job.status == 'DONE':
+                for child_job in s.query(Job).filter(Job.prev_job_id == job.job_id).all():
+                    child_status = self.get_job_tree_status(child_job)
+                    if child_status != 'complete':
+                        return child_status
+                return 'complete'
+            else:
+                return 'incomplete'
+        finally:
+            s.close()
+
+    def get_result_for_job_id(self, id, child=False, progress=True, analysis_id=None):
+        """ Get result for a given job id. If child flag is turned on and job child exist, get result for child job """
+        job = self.get_job_by_id(id)
+        if child:
+            job = self.get_job_child(job) or job
+        return self.get_result_for_job(job, progress=progress, analysis_id=analysis_id)
+
+    def _read_result(self, job, progress=False, analysis_id=None):
+        """
+        Determine if the job has completed. If the job has semaphored children, they are also checked
+        Also return progress of jobs, completed and total if flag is on
+        """
+        result = {"id": job.job_id}
+        try:
+            input_id = job.input_id
+            extended = re.match(r'^_extended_data_id\s+(\d+)', input_id)
+            if extended:
+                input_id = self.get_analysis_data_input(extended.group(1)).data
+            result['input'] = perl_string_to_python(input_id)
+            if job.status == 'DONE' and job.result is not None:
+                result['status'] = 'complete'
+                result['when_completed'] = job.when_completed
+                result['output'] = job.result.output_dict()
+            else:
+                result['status'] = self.get_job_tree_status(job)
+            if progress:
+                result['progress'] = self.get_all_jobs_progress(job.job_id, analysis_id=analysis_id)
+        except ValueError as e:
+            raise ValueError('Cannot retrieve results for job: {}'.format(job.job_id)) from e
+        except exc.SQLAlchemyError as e:
+            raise ValueError('DB error for job: {}'.format(job.job_id)) from e
+        return result
+
+    def get_result_for_job(self, job, progress=False, analysis_id=None):
+        """ Determine the status, input and output of a job, through the result cache """
+        if self.result_cache is None or progress:
+            return self._read_result(job, progress=progress, analysis_id=analysis_id)
+        # Read before the job, so that a result is never cached under a newer token than its own
+        version = self.version
+        row = (job.input_id, job.status, job.when_completed)
+        entry = self.result_cache.get(job.job_id)
+        if entry is not None:
+            cached_row, terminal, cached_version, result = entry
+            if cached_row == row and (terminal or cached_version == version):
+                return result
+        result = self._read_result(job)
+        terminal = result['status'] in ('complete', 'failed')
+        self.result_cache.set(job.job_id, (row, terminal, version, result),
+                              ttl=None if terminal else self.active_result_ttl)
+        return result
+
+    def get_job_child(self, job):
+        """ Get child job for a given parent job """
+        s = self.Session()
+        try:
+            return s.query(Job).filter(Job.prev_job_id == job.job_id).first()
+        finally:
+            s.close()
+
+    def check_semaphores_for_job(self, semaphore_data):
+        """ Check whether all the semaphored children of a job have completed """
+        s = self.Session()
+        try:
+            jobs = dict(s.query(Job.status, func.count(Job.status)).filter(
+                Job.controlled_semaphore_id == semaphore_data.semaphore_id).group_by(Job.status).all())
+            if jobs.get('FAILED', 0) > 0:
+                return 'failed'
+            elif jobs.get('READY', 0) > 0 or jobs.get('RUN', 0) > 0 or jobs.get('SEMAPHORED', 0) > 0:
+                return 'incomplete'
+            return 'complete'
+        finally:
+            s.close()
+
+    def _filter_jobs(self, query, analysis_name, status=None, ensembl_release=None, tag=None):
+        """
+        Restrict a job query to an analysis and, optionally, a hive status and
+        values of the submitted input. Input values are matched against the
+        Perl hash stored in job.input_id, as written by dict_to_perl_string.
+        """
+        query = query.join(Analysis).filter(Analysis.logic_name == analysis_name)
+        if status is not None:
+            query = query.filter(Job.status == HIVE_STATUSES.get(status.lower(), status.upper()))
+        for key, value in (('ensembl_release', ensembl_release), ('tag', tag)):
+            if value is None:
+                continue
+            quoted = '"%s" => "%s"' % (key, value)
+            if str(value).isdigit():
+                query = query.filter(or_(Job.input_id.contains(quoted, autoescape=True),
+                                         Job.input_id.contains('"%s" => %s,' % (key, value), autoescape=True),
+                                         Job.input_id.contains('"%s" => %s}' % (key, value), autoescape=True)))
+            else:
+                query = query.filter(Job.input_id.contains(quoted, autoescape=True))
+        return query
+
+    def count_jobs(self, analysis_name, status=None, ensembl_release=None, tag=None):
+        """ Count the jobs from the specified analysis matching the given filters """
+        s = self.Session()
+        try:
+            query = self._filter_jobs(s.query(func.count(Job.job_id)), analysis_name, status, ensembl_release, tag)
+            return query.scalar()
+        finally:
+            s.close()
+
+    def _page_jobs(self, query, limit=None, offset=None, after_job_id=None, order='desc'):
+        """ Order a job query by job_id and restrict it to one page """
+        if order == 'asc':
+            if after_job_id is not None:
+                query = query.filter(Job.job_id > after_job_id)
+            query = query.order_by(Job.job_id.asc())
+        else:
+            if after_job_id is not None:
+                query = query.filter(Job.job_id < after_job_id)
+            query = query.order_by(Job.job_id.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        if offset:
+            query = query.offset(offset)
+        return query
+
+    def get_results(self, analysis_name, limit=None, offset=None, after_job_id=None, order='desc',
+                    status=None, ensembl_release=None, tag=None):
+        """
+        Find one page of jobs from the specified analysis, ordered by job_id.
+        Either offset or after_job_id (keyset pagination, exclusive) may be
+        used to select the page.
+        """
+        s = self.Session()
+        try:
+            query = self._filter_jobs(s.query(Job), analysis_name, status, ensembl_release, tag)
+            jobs = self._page_jobs(query, limit, offset, after_job_id, order).all()
+        finally:
+            s.close()
+        return [self.get_result_for_job(job) for job in jobs]
+
+    def iter_results(self, analysis_name, limit=None, offset=None, after_job_id=None, order='desc',
+                     status=None, ensembl_release=None, tag=None, chunk_size=500):
+        """
+        Generate the results of the jobs selected as in get_results, reading
+        the jobs from a server-side cursor ``chunk_size`` rows at a time, so
+        memory use does not grow with the number of jobs. The session is held
+        until the generator is exhausted or closed.
+        """
+        s = self.Session()
+        try:
+            query = self._filter_jobs(s.query(Job), analysis_name, status, ensembl_release, tag)
+            query = self._page_jobs(query, limit, offset, after_job_id, order)
+            for job in query.execution_options(stream_results=True).yield_per(chunk_size):
+                yield self.get_result_for_job(job)
+        finally:
+            s.close()
+
+    def get_version(self):
+        """
+        Cheap token that changes whenever a job is added or changes status.
+        Built from the highest job_id and the count and sum of the job_ids
+        per analysis and status, which are read from the primary key and the
+        hive's (analysis_id, status) index rather than the job rows. The sums
+        change even when transitions offset each other in the counts. Every
+        analysis is counted, as the reported status of a job also depends on
+        its children.
+        """
+        s = self.Session()
+        try:
+            last_job_id = s.query(func.max(Job.job_id)).scalar()
+            rows = s.query(Job.analysis_id, Job.status, func.count(), func.sum(Job.job_id)) \
+                .group_by(Job.analysis_id, Job.status).order_by(Job.analysis_id, Job.status).all()
+        finally:
+            s.close()
+        if self.last_job_id is not None and (last_job_id or 0) < self.last_job_id:
+            # Jobs were deleted or the hive reseeded, cached job_ids may now be other jobs
+            self.clear_result_cache()
+        self.last_job_id = last_job_id or 0
+        self.version = '%s;' % last_job_id + ';'.join('%s:%s:%s:%s' % tuple(row) for row in rows)
+        return self.version
+
+    def count_jobs_by_status(self, analysis_name):
+        """ Count the jobs of an analysis by their own status, named as in JOB_STATUSES """
+        s = self.Session()
+        try:
+            rows = s.query(Job.status, func.count(Job.job_id)).join(Analysis) \
+                .filter(Analysis.logic_name == analysis_name).group_by(Job.status).all()
+        finally:
+            s.close()
+        return {JOB_STATUSES.get(status, status.lower()): count for status, count in rows}
+
+    def get_job_statuses(self, ids, chunk_size=500):
+        """ Get the own status of each of a set of jobs, named as in JOB_STATUSES, by job_id """
+        ids = list(ids)
+        statuses = {}
+        s = self.Session()
+        try:
+            for start in range(0, len(ids), chunk_size):
+                rows = s.query(Job.job_id, Job.status).filter(Job.job_id.in_(ids[start:start + chunk_size])).all()
+                statuses.update((job_id, JOB_STATUSES.get(status, status.lower())) for job_id, status in rows)
+        finally:
+            s.close()
+        return statuses
+
+    def find_jobs(self, analysis_name, key, values):
+        """
+        Find the jobs of an analysis whose input has ``key`` set to one of
+        ``values``, which must be plain strings, returning their job_id by
+        value. Only jobs whose raw input contains one of the values are parsed.
+        """
+        values = set(values)
+        found = {}
+        s = self.Session()
+        try:
+            query = s.query(Job.job_id, Job.input_id).join(Analysis) \
+                .filter(Analysis.logic_name == analysis_name,
+                        or_(*[Job.input_id.contains(value, autoescape=True) for value in values]))
+            for job_id, input_id in query.all():
+                value = self._parse_input(job_id, input_id).get(key)
+                if value in values:
+                    found[value] = job_id
+        finally:
+            s.close()
+        return found
+
+    def iter_job_inputs(self, analysis_name, after_job_id=0, chunk_size=500):
+        """
+        Generate ``(job_id, status, input)`` for the jobs of an analysis after
+        after_job_id, in job_id order. The status is the job's own, named as in
+        JOB_STATUSES; job trees and results are not queried.
+        """
+        s = self.Session()
+        try:
+            query = s.query(Job.job_id, Job.status, Job.input_id).join(Analysis) \
+                .filter(Analysis.logic_name == analysis_name, Job.job_id > after_job_id).order_by(Job.job_id.asc())
+            for job_id, status, input_id in query.execution_options(stream_results=True).yield_per(chunk_size):
+                yield job_id, JOB_STATUSES.get(status, status.lower()), self._parse_input(job_id, input_id)
+        finally:
+            s.close()
+
+    def _parse_input(self, job_id, input_id):
+        extended = re.match(r'^_extended_data_id\s+(\d+)', input_id)
+        if extended:
+            input_id = self.get_analysis_data_input(extended.group(1)).data
+        try:
+            return perl_string_to_python(input_id)
+        except ValueError:
+            logger.warning(f'Unable to parse the input of job {job_id}')
+            return {}
+
+    def get_results_for_job_ids(self, ids, progress=False, chunk_size=500):
+        """ Get results for a set of job ids, fetching the jobs ``chunk_size`` ids per query """
+        ids = list(ids)
+        jobs = []
+        s = self.Session()
+        try:
+            for start in range(0, len(ids), chunk_size):
+                jobs.extend(s.query(Job).filter(Job.job_id.in_(ids[start:start + chunk_size])).all())
+        finally:
+            s.close()
+        return {job.job_id: self.get_result_for_job(job, progress=progress) for job in jobs}
+
+    def get_all_results(self, analysis_name, child=False):
+        """ Find all jobs from the specified analysis """
+        s = self.Session()
+        try:
+            jobs = s.query(Job).join(Analysis).filter(Analysis.logic_name == analysis_name).all()
+        finally:
+            s.close()
+        if child:
+            jobs = [self.get_job_child(job) or job for job in jobs]
+        return [self.get_result_for_job(job) for job in jobs]
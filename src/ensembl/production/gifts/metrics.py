@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+Prometheus metrics for the GIFTs service.
+
+Under gunicorn, set PROMETHEUS_MULTIPROC_DIR to an empty directory writable by
+the workers, so that /metrics aggregates the samples of all worker processes.
+"""
+import inspect
+import os
+import time
+from functools import wraps
+
+from flask import g, request
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest
+from prometheus_client import multiprocess
+
+__all__ = ['REQUEST_LATENCY', 'HIVE_LATENCY', 'GIFTS_STATUS_LATENCY', 'GIFTS_STATUS_ERRORS', 'GIFTS_API_URIS_READS',
+           'CACHE_REQUESTS', 'CIRCUIT_TRANSITIONS', 'COALESCED_CALLS', 'RATE_LIMITED_REQUESTS', 'InstrumentedHive',
+           'init_app', 'metrics_response']
+
+REQUEST_LATENCY = Histogram(
+    'gifts_request_duration_seconds', 'Latency of HTTP requests by Flask endpoint',
+    ['endpoint', 'method', 'status']
+)
+HIVE_LATENCY = Histogram(
+    'gifts_hive_query_duration_seconds', 'Latency of hive database calls by pipeline and operation',
+    ['pipeline', 'operation']
+)
+GIFTS_STATUS_LATENCY = Histogram(
+    'gifts_status_request_duration_seconds', 'Latency of GIFTs service status calls'
+)
+GIFTS_STATUS_ERRORS = Counter(
+    'gifts_status_errors_total', 'Failed GIFTs service status calls'
+)
+GIFTS_API_URIS_READS = Counter(
+    'gifts_api_uris_reads_total', 'Reads of the GIFTs API URIs file by outcome',
+    ['result']
+)
+CACHE_REQUESTS = Counter(
+    'gifts_cache_requests_total', 'Cache lookups by cache and outcome (hit or miss)',
+    ['cache', 'result']
+)
+CIRCUIT_TRANSITIONS = Counter(
+    'gifts_circuit_transitions_total', 'Circuit breaker state changes by backend and new state (open or closed)',
+    ['backend', 'state']
+)
+COALESCED_CALLS = Counter(
+    'gifts_coalesced_calls_total', 'Calls which waited for an identical call in flight instead of making it',
+    ['operation']
+)
+RATE_LIMITED_REQUESTS = Counter(
+    'gifts_rate_limited_requests_total', 'Requests rejected by the per-client rate limit, by Flask endpoint',
+    ['endpoint']
+)
+
+
+def _timed_iteration(generator, histogram, elapsed):
+    # Only the time spent producing the items, not consuming them, once the generator is done with
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(generator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        generator.close()
+        histogram.observe(elapsed)
+
+
+class InstrumentedHive:
+    """
+    Proxy to a hive instance recording the latency of each call. For a
+    generator, the time spent iterating it is recorded.
+    """
+
+    def __init__(self, hive, pipeline):
+        self._hive = hive
+        self._pipeline = pipeline
+
+    def __getattr__(self, name):
+        attr = getattr(self._hive, name)
+        if not callable(attr):
+            return attr
+
+        @wraps(attr)
+        def timed(*args, **kwargs):
+            histogram = HIVE_LATENCY.labels(self._pipeline, name)
+            start = time.perf_counter()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception:
+                histogram.observe(time.perf_counter() - start)
+                raise
+            if inspect.isgenerator(result):
+                return _timed_iteration(result, histogram, time.perf_counter() - start)
+            histogram.observe(time.perf_counter() - start)
+            return result
+        return timed
+
+
+def init_app(app):
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        start = g.pop('request_start', None)
+        if start is not None:
+            REQUEST_LATENCY.labels(request.endpoint or 'unknown', request.method, response.status_code) \
+                .observe(time.perf_counter() - start)
+        return response
+
+
+def metrics_response():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), 200, {'Content-Type': CONTENT_TYPE_LATEST}
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+Per-request profiling and slow-request logging.
+
+Each request records the time it spends in hive SQL, outbound HTTP calls and
+template rendering. Requests slower than a threshold are logged with that
+breakdown. Requests carrying the profiling header, or sampled at random, are
+also run under cProfile. Their profile is logged, or written to a directory
+for e.g. snakeviz, and the breakdown is returned in a Server-Timing header.
+"""
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import time
+from contextlib import contextmanager
+
+from jinja2 import Template
+from werkzeug.wsgi import ClosingIterator
+
+__all__ = ['RequestTimings', 'ProfilingMiddleware', 'timed', 'before_cursor_execute', 'after_cursor_execute',
+           'init_app']
+
+_timings = contextvars.ContextVar('gifts_request_timings', default=None)
+
+
+class RequestTimings:
+    """ Time spent and number of calls, by kind, during one request """
+
+    KINDS = ('sql', 'http', 'template')
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(self.KINDS, 0.0)
+        self.calls = dict.fromkeys(self.KINDS, 0)
+
+    def add(self, kind, seconds):
+        self.seconds[kind] += seconds
+        self.calls[kind] += 1
+
+    def breakdown(self, elapsed):
+        parts = [f'{kind} {self.seconds[kind]:.3f}s ({self.calls[kind]})' for kind in self.KINDS]
+        parts.append(f'other {max(0.0, elapsed - sum(self.seconds.values())):.3f}s')
+        return ', '.join(parts)
+
+    def server_timing(self):
+        return ', '.join(f'{kind};dur={self.seconds[kind] * 1000:.1f};desc="{self.calls[kind]} calls"'
+                         for kind in self.KINDS)
+
+
+@contextmanager
+def timed(kind):
+    """ Add the time spent in the block to the current request's timings, if any """
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(kind, time.perf_counter() - start)
+
+
+# SQLAlchemy engine event listeners timing each statement
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _timings.get() is not None:
+        context._gifts_query_start = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _timings.get()
+    start = getattr(context, '_gifts_query_start', None)
+    if timings is not None and start is not None:
+        timings.add('sql', time.perf_counter() - start)
+
+
+class TimedTemplate(Template):
+    """ Jinja template recording its rendering time """
+
+    def render(self, *args, **kwargs):
+        with timed('template'):
+            return super().render(*args, **kwargs)
+
+
+class ProfilingMiddleware:
+    """
+    WSGI middleware timing each request until its response has been sent,
+    streamed responses included.
+
+    Profiling is triggered by the ``header`` request header, if set, or for a
+    ``sample_rate`` fraction of requests. Requests taking ``slow_threshold``
+    seconds or more are logged, unless the threshold is 0.
+    """
+
+    def __init__(self, wsgi_app, logger, sample_rate=0.0, header=None, slow_threshold=0.0, profile_dir=None):
+        self.wsgi_app = wsgi_app
+        self.logger = logger
+        self.sample_rate = sample_rate
+        self.header_key = 'HTTP_' + header.upper().replace('-', '_') if header else None
+        self.slow_threshold = slow_threshold
+        self.profile_dir = profile_dir
+
+    def __call__(self, environ, start_response):
+        requested = self.header_key is not None and environ.get(self.header_key, '').lower() in ('1', 'true', 'yes')
+        profiler = None
+        if requested or (self.sample_rate and random.random() < self.sample_rate):
+            profiler = cProfile.Profile()
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        status = []
+
+        def recording_start_response(status_line, headers, exc_info=None):
+            status[:] = [status_line.split(' ', 1)[0]]
+            if requested:
+                headers = list(headers) + [('Server-Timing', timings.server_timing())]
+            return start_response(status_line, headers, exc_info)
+
+        start = time.perf_counter()
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one active profiler per process, e.g. under gthread
+                profiler = None
+        try:
+            response = self.wsgi_app(environ, recording_start_response)
+        except BaseException:
+            self._finish(environ, status, start, timings, profiler, token)
+            raise
+        return ClosingIterator(response, lambda: self._finish(environ, status, start, timings, profiler, token))
+
+    def _finish(self, environ, status, start, timings, profiler, token):
+        if profiler is not None:
+            profiler.disable()
+        elapsed = time.perf_counter() - start
+        _timings.reset(token)
+
+        request_line = environ.get('REQUEST_METHOD', '') + ' ' + environ.get('SCRIPT_NAME', '') + \
+            environ.get('PATH_INFO', '')
+        if environ.get('QUERY_STRING'):
+            request_line += '?' + environ['QUERY_STRING']
+        summary = f'{request_line} {status[0] if status else "-"} {elapsed:.3f}s: {timings.breakdown(elapsed)}'
+        if self.slow_threshold and elapsed >= self.slow_threshold:
+            self.logger.warning(f'Slow request {summary}')
+        if profiler is not None:
+            self._report(profiler, environ, summary)
+
+    def _report(self, profiler, environ, summary):
+        if self.profile_dir:
+            name = re.sub(r'[^A-Za-z0-9]+', '_', environ.get('PATH_INFO', '')).strip('_') or 'root'
+            path = os.path.join(self.profile_dir, f'{time.time():.6f}-{environ.get("REQUEST_METHOD")}-{name}.prof')
+            profiler.dump_stats(path)
+            self.logger.info(f'Profiled request {summary}, profile written to {path}')
+        else:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(30)
+            self.logger.info(f'Profiled request {summary}\n{stream.getvalue()}')
+
+
+def init_app(app, sample_rate=0.0, header=None, slow_threshold=0.0, profile_dir=None):
+    """
+    Record the template timings of each request, and wrap the app's WSGI
+    callable with ProfilingMiddleware. SQL is timed by engines listening to
+    before_cursor_execute and after_cursor_execute.
+    """
+    app.jinja_env.template_class = TimedTemplate
+    app.wsgi_app = ProfilingMiddleware(app.wsgi_app, app.logger, sample_rate=sample_rate, header=header,
+                                       slow_threshold=slow_threshold, profile_dir=profile_dir)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import os
+import threading
+
+from ensembl.production.gifts.cache import LRUCache
+
+__all__ = ['HiveRegistry', 'hive_registry']
+
+
+class HiveRegistry:
+    """
+    Process-wide registry holding one PooledHiveInstance per pipeline type.
+
+    Instances are created on first use and dropped whenever the registry
+    detects it is running in a different process from the one that created
+    them, so it is safe to use from forked gunicorn workers.
+    """
+
+    def __init__(self, result_cache_size=0, **options):
+        self.result_cache_size = result_cache_size
+        self.options = options
+        self._hives = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def configure(self, result_cache_size=None, **options):
+        if result_cache_size is not None:
+            self.result_cache_size = result_cache_size
+        self.options.update(options)
+
+    def get(self, hive_type, url):
+        if self._pid != os.getpid():
+            self.reset()
+        hive = self._hives.get(hive_type)
+        if hive is None or hive.url != url:
+            with self._lock:
+                hive = self._hives.get(hive_type)
+                if hive is None or hive.url != url:
+                    result_cache = None
+                    if self.result_cache_size:
+                        result_cache = LRUCache(f'{hive_type}_results', self.result_cache_size)
+                    # SQLAlchemy and the hive models are only imported once a hive is used
+                    from ensembl.production.gifts.hive import PooledHiveInstance
+                    hive = PooledHiveInstance(url, result_cache=result_cache, **self.options)
+                    self._hives[hive_type] = hive
+        return hive
+
+    def reset(self):
+        """
+        Forget all the pooled instances. Connections inherited from a parent
+        process are left untouched for the parent to use.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                for hive in self._hives.values():
+                    hive.dispose()
+            self._hives = {}
+            self._pid = os.getpid()
+
+
+hive_registry = HiveRegistry()
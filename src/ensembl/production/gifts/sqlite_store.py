@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import sqlite3
+from contextlib import contextmanager
+
+__all__ = ['SQLiteStore']
+
+
+class SQLiteStore:
+    """
+    Base of the local SQLite databases shared by the workers of the service.
+
+    The database is put in WAL mode, so that readers do not block the
+    writer, and ``schema`` is applied when the store is created. Each
+    operation uses its own connection, so stores are safe to share between
+    threads and forked processes.
+    """
+
+    def __init__(self, path, schema):
+        self.path = path
+        connection = self._connect()
+        try:
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Outside of a transaction: executescript commits any pending one
+            connection.executescript(schema)
+        finally:
+            connection.close()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        """ Connection in a write transaction, committed unless the block raises """
+        # BEGIN IMMEDIATE takes the write lock up front, serialising writers across processes
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield connection
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        finally:
+            connection.close()
+
+    @contextmanager
+    def _reading(self):
+        connection = self._connect()
+        try:
+            yield connection
+        finally:
+            connection.close()
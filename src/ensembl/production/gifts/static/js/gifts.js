@@ -1,5 +1,6 @@
 
 function statusFormat(value) {
+    value = value.charAt(0).toUpperCase() + value.slice(1).toLowerCase()
     if (value === 'Complete') {
         return '<span class="badge badge-success">' + value + '</span>'
     } else if (value === 'Failed') {
@@ -8,3 +9,9 @@ function statusFormat(value) {
         return '<span class="badge badge-primary">' + value + '</span>'
     }
 }
+
+function jobListParams(params) {
+    // Only request the fields of the table's columns, from the table options passed as this
+    params.fields = this.columns[0].map(function (column) { return column.field }).join(',')
+    return params
+}
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+Durable queue of job submissions, drained into the hive in the background.
+
+Submissions are stored in a local SQLite database shared by all the workers
+of the service, so that a submission is accepted without waiting on the
+GIFTs status check or the hive insert, and survives a restart.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from ensembl.production.gifts.sqlite_store import SQLiteStore
+
+__all__ = ['SubmissionQueue', 'SubmissionWorker', 'idempotency_key', 'TOKEN_KEY']
+
+logger = logging.getLogger(__name__)
+
+# Job input field holding the token of the submission the job was created for
+TOKEN_KEY = 'submission_token'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submission (
+    submission_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL,
+    pipeline TEXT NOT NULL,
+    analysis TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    token TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    job_id INTEGER,
+    error TEXT,
+    claim TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS submission_key ON submission (idempotency_key, created);
+CREATE INDEX IF NOT EXISTS submission_status ON submission (status, submission_id);
+CREATE INDEX IF NOT EXISTS submission_claim ON submission (claim);
+"""
+
+
+def idempotency_key(pipeline, payload, client_key=None):
+    """
+    Key identifying repeats of the same submission: the client's own key if
+    given, otherwise a hash of the release, environment and tag submitted
+    """
+    if client_key:
+        return f'client:{pipeline}:{client_key}'
+    # As strings, so that a release submitted as 110 or "110" is the same
+    fields = [pipeline] + [None if payload.get(field) is None else str(payload[field])
+                           for field in ('ensembl_release', 'environment', 'tag')]
+    return 'payload:' + hashlib.sha256(json.dumps(fields).encode()).hexdigest()
+
+
+class SubmissionQueue(SQLiteStore):
+    """
+    Submissions stored in SQLite, each ``queued``, being submitted, then
+    ``submitted`` with its hive job_id or ``failed`` with an error.
+
+    A key only deduplicates submissions made within ``key_ttl`` seconds of
+    each other, and never a failed one, so that a release can be resubmitted
+    later. A claim not completed within ``claim_timeout`` seconds, e.g.
+    because its worker died, is handed out again.
+    """
+
+    def __init__(self, path, key_ttl=86400, claim_timeout=300):
+        super().__init__(path, SCHEMA)
+        self.key_ttl = key_ttl
+        self.claim_timeout = claim_timeout
+
+    @staticmethod
+    def _as_dict(row):
+        return {
+            'submission_id': row['submission_id'],
+            'pipeline': row['pipeline'],
+            'status': 'queued' if row['status'] == 'submitting' else row['status'],
+            'job_id': row['job_id'],
+            'error': row['error'],
+            'created': row['created'],
+            'updated': row['updated'],
+        }
+
+    def enqueue(self, pipeline, analysis, payload, key):
+        """
+        Queue a submission unless one with the same key was made recently.
+        Returns the submission, new or existing, and whether it was created.
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT * FROM submission WHERE idempotency_key = ? AND created > ? AND status != 'failed' "
+                "ORDER BY submission_id DESC LIMIT 1",
+                (key, now - self.key_ttl)
+            ).fetchone()
+            if row is not None:
+                return self._as_dict(row), False
+            cursor = connection.execute(
+                "INSERT INTO submission (idempotency_key, pipeline, analysis, payload, token, status, created, "
+                "updated) VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+                (key, pipeline, analysis, json.dumps(payload), uuid.uuid4().hex, now, now)
+            )
+            row = connection.execute('SELECT * FROM submission WHERE submission_id = ?',
+                                     (cursor.lastrowid,)).fetchone()
+        return self._as_dict(row), True
+
+    def get(self, submission_id):
+        with self._reading() as connection:
+            row = connection.execute('SELECT * FROM submission WHERE submission_id = ?',
+                                     (submission_id,)).fetchone()
+        return None if row is None else self._as_dict(row)
+
+    def claim(self, limit):
+        """
+        Claim up to ``limit`` queued submissions, oldest first, for this
+        caller only. Returns them with their pipeline, analysis, payload,
+        token and how many times they have been claimed.
+        """
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE submission SET status = 'submitting', claim = ?, attempts = attempts + 1, updated = ? "
+                "WHERE submission_id IN ("
+                "SELECT submission_id FROM submission WHERE status = 'queued' "
+                "OR (status = 'submitting' AND updated < ?) ORDER BY submission_id LIMIT ?)",
+                (token, now, now - self.claim_timeout, limit)
+            )
+            rows = connection.execute('SELECT * FROM submission WHERE claim = ? ORDER BY submission_id',
+                                      (token,)).fetchall()
+        return [{'submission_id': row['submission_id'], 'pipeline': row['pipeline'], 'analysis': row['analysis'],
+                 'payload': json.loads(row['payload']), 'token': row['token'], 'attempts': row['attempts']}
+                for row in rows]
+
+    def release(self, submission_ids):
+        """ Put claimed submissions not yet finished back in the queue, to be retried """
+        with self._transaction() as connection:
+            connection.executemany(
+                "UPDATE submission SET status = 'queued', claim = NULL, updated = ? "
+                "WHERE submission_id = ? AND status = 'submitting'",
+                [(time.time(), submission_id) for submission_id in submission_ids]
+            )
+
+    def finish(self, results):
+        """ Record the outcome of claimed submissions, a dict of job_id or error by submission_id """
+        now = time.time()
+        with self._transaction() as connection:
+            connection.executemany(
+                "UPDATE submission SET status = ?, job_id = ?, error = ?, claim = NULL, updated = ? "
+                "WHERE submission_id = ?",
+                [('failed' if 'error' in result else 'submitted', result.get('job_id'), result.get('error'),
+                  now, submission_id) for submission_id, result in results.items()]
+            )
+
+
+class SubmissionWorker:
+    """
+    Drains a SubmissionQueue in a daemon thread per process, in batches.
+
+    ``submit(pipeline, analysis, payloads)`` creates the hive jobs for a
+    batch and returns, for each payload, a dict with either a job_id or an
+    error. Each payload is submitted with its submission's token under
+    TOKEN_KEY.
+    If it raises an error for which ``is_transient`` is true, e.g. the hive
+    is unreachable, the batch is put back in the queue and retried after
+    ``interval`` seconds. Any other error is taken to be caused by the
+    submissions: they are submitted one at a time and those still failing
+    are marked failed.
+
+    A submission claimed before may already have its job, if its worker died
+    between creating it and recording it. ``find_submitted(pipeline,
+    analysis, key, tokens)`` returns the job_id of the jobs created for any
+    of the tokens, by token, so that these are not submitted twice.
+    """
+
+    def __init__(self, queue, submit, find_submitted=None, is_transient=lambda e: True, batch_size=100,
+                 interval=1.0):
+        self.queue = queue
+        self.submit = submit
+        self.find_submitted = find_submitted
+        self.is_transient = is_transient
+        self.batch_size = batch_size
+        self.interval = interval
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def start(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # The draining thread does not survive a fork
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='gifts-submissions', daemon=True).start()
+
+    def notify(self):
+        """ Drain the queue now rather than at the next interval """
+        self.start()
+        self._wake.set()
+
+    def drain(self):
+        """ Submit queued submissions until none are left, returning how many were processed """
+        processed = 0
+        while True:
+            claimed = self.queue.claim(self.batch_size)
+            if not claimed:
+                return processed
+            batches = {}
+            for submission in claimed:
+                batches.setdefault((submission['pipeline'], submission['analysis']), []).append(submission)
+            error = None
+            for (pipeline, analysis), submissions in batches.items():
+                try:
+                    self._submit(pipeline, analysis, submissions)
+                except Exception as e:
+                    self.queue.release([submission['submission_id'] for submission in submissions])
+                    error = e
+            if error is not None:
+                raise error
+            processed += len(claimed)
+
+    def _submit(self, pipeline, analysis, submissions):
+        retried = [submission['token'] for submission in submissions if submission['attempts'] > 1]
+        if retried and self.find_submitted is not None:
+            found = self.find_submitted(pipeline, analysis, TOKEN_KEY, retried)
+            if found:
+                self.queue.finish({submission['submission_id']: {'job_id': found[submission['token']]}
+                                   for submission in submissions if submission['token'] in found})
+                submissions = [submission for submission in submissions if submission['token'] not in found]
+            if not submissions:
+                return
+        payloads = [dict(submission['payload'], **{TOKEN_KEY: submission['token']}) for submission in submissions]
+        try:
+            results = self.submit(pipeline, analysis, payloads)
+        except Exception as e:
+            if self.is_transient(e):
+                raise
+            if len(submissions) > 1:
+                for submission in submissions:
+                    self._submit(pipeline, analysis, [submission])
+                return
+            logger.error(f'Unable to submit queued job {submissions[0]["submission_id"]}: {e}')
+            results = [{'error': str(e)}]
+        self.queue.finish({submission['submission_id']: result
+                           for submission, result in zip(submissions, results)})
+
+    def _run(self):
+        while True:
+            try:
+                self.drain()
+            except Exception as e:
+                logger.error(f'Unable to submit queued jobs: {e}')
+            self._wake.wait(self.interval)
+            self._wake.clear()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import logging
+import threading
+import time
+from collections import Counter
+
+__all__ = ['JobSummary']
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('complete', 'failed')
+
+
+class JobSummary:
+    """
+    Job counts by status and Ensembl release for one pipeline, with the most
+    recent job of each release, kept up to date incrementally.
+
+    Statuses are the submission jobs' own, as used by the status filter of
+    the job lists. A refresh reads only the jobs added since the last one and
+    rechecks the status of the jobs that were neither complete nor failed.
+    The per-status counts are then compared with the hive's. The summary is
+    rebuilt from scratch only if they differ (e.g. a finished job was reset)
+    or every ``rebuild_interval`` seconds.
+    """
+
+    def __init__(self, hive_factory, analysis_name, rebuild_interval=3600):
+        self.hive_factory = hive_factory
+        self.analysis_name = analysis_name
+        self.rebuild_interval = rebuild_interval
+        self.rebuilds = 0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.version = None
+        self.built = None
+        self.last_job_id = 0
+        self.by_status = Counter()
+        self.by_release = {}
+        self.latest = {}
+        # Release and status of the jobs which may still change status
+        self.active = {}
+
+    def _add(self, job_id, status, job_input):
+        release = str(job_input.get('ensembl_release', 'unknown'))
+        self.by_status[status] += 1
+        self.by_release.setdefault(release, Counter())[status] += 1
+        latest = self.latest.get(release)
+        if latest is None or job_id > latest['job_id']:
+            self.latest[release] = {
+                'job_id': job_id,
+                'status': status,
+                'environment': job_input.get('environment'),
+                'tag': job_input.get('tag'),
+                'timestamp': job_input.get('timestamp'),
+            }
+        if status not in TERMINAL_STATUSES:
+            self.active[job_id] = (release, status)
+        self.last_job_id = max(self.last_job_id, job_id)
+
+    def _change_status(self, job_id, status):
+        release, previous = self.active[job_id]
+        if status == previous:
+            return
+        for counts in (self.by_status, self.by_release[release]):
+            counts[previous] -= 1
+            counts[status] += 1
+        if self.latest[release]['job_id'] == job_id:
+            self.latest[release]['status'] = status
+        if status in TERMINAL_STATUSES:
+            del self.active[job_id]
+        else:
+            self.active[job_id] = (release, status)
+
+    def _scan(self, hive):
+        for job_id, status, job_input in hive.iter_job_inputs(self.analysis_name, after_job_id=self.last_job_id):
+            self._add(job_id, status, job_input)
+
+    def _rebuild(self, hive):
+        self._reset()
+        self._scan(hive)
+        self.built = time.monotonic()
+        self.rebuilds += 1
+
+    def refresh(self, version=None):
+        """
+        Bring the summary up to date, unless the hive version token, passed in
+        or fetched, is the one it was last refreshed at
+        """
+        hive = self.hive_factory()
+        with self._lock:
+            version = version or hive.get_version()
+            expired = self.built is None or time.monotonic() - self.built >= self.rebuild_interval
+            if version == self.version and not expired:
+                return
+            if expired:
+                self._rebuild(hive)
+            else:
+                for job_id, status in hive.get_job_statuses(self.active).items():
+                    self._change_status(job_id, status)
+                self._scan(hive)
+                if +self.by_status != Counter(hive.count_jobs_by_status(self.analysis_name)):
+                    logger.info(f'Job counts of {self.analysis_name} changed outside the summary, rebuilding it')
+                    self._rebuild(hive)
+            self.version = version
+
+    def summary(self, version=None):
+        self.refresh(version)
+        with self._lock:
+            return {
+                'total': sum(self.by_status.values()),
+                'last_job_id': self.last_job_id,
+                'by_status': dict(+self.by_status),
+                'by_release': {
+                    release: {
+                        'total': sum(counts.values()),
+                        'by_status': dict(+counts),
+                        'latest': dict(self.latest[release]),
+                    } for release, counts in self.by_release.items()
+                },
+            }
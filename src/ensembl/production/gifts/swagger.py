@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+Flasgger set up without parsing the API specification at start-up.
+"""
+from flasgger import Swagger
+
+__all__ = ['LazySwagger']
+
+
+class LazySwagger(Swagger):
+    """
+    Swagger reading its ``template_file`` when the specification is first
+    needed, i.e. on the first hit on the API docs, rather than in init_app
+    """
+
+    def __init__(self, app=None, template_file=None, **kwargs):
+        self._template = None
+        self._lazy_template_file = template_file
+        super().__init__(app=app, **kwargs)
+
+    @property
+    def template(self):
+        if self._template is None and self._lazy_template_file is not None:
+            self._template = self.load_swagger_file(self._lazy_template_file)
+        return self._template
+
+    @template.setter
+    def template(self, template):
+        self._template = template
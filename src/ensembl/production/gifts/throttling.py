@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from ensembl.production.gifts.metrics import COALESCED_CALLS
+
+__all__ = ['SingleFlight', 'TokenBuckets']
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls within a process: while a call for a
+    key is in flight, callers with the same key wait for it and share its
+    result, or its exception, instead of making the call again.
+
+    Shared results must not be modified by the callers.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        if self._pid != os.getpid():
+            # Calls in flight in the parent never complete in a forked worker
+            self._calls = {}
+            self._lock = threading.Lock()
+            self._pid = os.getpid()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            COALESCED_CALLS.labels(self.name).inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class TokenBuckets:
+    """
+    Per-client token bucket rate limiter, holding ``burst`` tokens per client
+    refilled at ``rate`` tokens per second. State is kept for the
+    ``max_clients`` most recently seen clients of the process; a forgotten
+    client starts again with a full bucket.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, client):
+        """ Take a token for the client. Returns 0 if granted, otherwise the seconds until one is available """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / self.rate
+            self._buckets[client] = (tokens - 1 if not wait else tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return math.ceil(wait)
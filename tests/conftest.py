@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import json
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parents[1]
+# The stand-in backends are shared with the benchmarks
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+sys.path.insert(0, str(ROOT / 'src'))
+
+from standins import StatusStub, seed_hive  # noqa: E402
+
+# Jobs of a seeded hive cycle through DONE, DONE, DONE, FAILED, READY, RUN
+SEEDED_JOBS = 60
+
+
+class SeededHive:
+    """ SQLite hive database seeded with jobs, changed directly as the pipeline would """
+
+    def __init__(self, path, jobs=SEEDED_JOBS):
+        self.path = path
+        self.url = seed_hive(path, jobs)
+
+    def execute(self, sql, *params):
+        connection = sqlite3.connect(self.path)
+        try:
+            connection.execute(sql, params)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def set_status(self, job_id, status):
+        self.execute('UPDATE job SET status = ? WHERE job_id = ?', status, job_id)
+
+    def delete_job(self, job_id):
+        self.execute('DELETE FROM result WHERE job_id = ?', job_id)
+        self.execute('DELETE FROM job WHERE job_id = ?', job_id)
+
+
+@pytest.fixture
+def seeded_hive(tmp_path):
+    return SeededHive(str(tmp_path / 'hive.db'))
+
+
+@pytest.fixture
+def hive(seeded_hive):
+    from ensembl.production.gifts.hive import PooledHiveInstance
+    hive = PooledHiveInstance(seeded_hive.url)
+    yield hive
+    hive.dispose()
+
+
+@pytest.fixture(scope='session')
+def status_stub():
+    with StatusStub() as stub:
+        yield stub
+
+
+@pytest.fixture(scope='session')
+def app_hives(tmp_path_factory, status_stub):
+    """
+    Hives of the application, configured before it is imported as its
+    configuration is read at import time
+    """
+    path = tmp_path_factory.mktemp('app')
+    hives = {hive_type: SeededHive(str(path / f'{hive_type}.db')) for hive_type in ('update_ensembl', 'process_mapping')}
+    uris = path / 'gifts_api_uris.json'
+    uris.write_text(json.dumps({'test': status_stub.url}))
+    os.environ.update({
+        'HIVE_UPDATE_ENSEMBL_URI': hives['update_ensembl'].url,
+        'HIVE_PROCESS_MAPPING_URI': hives['process_mapping'].url,
+        'GIFTS_APIS_URIS_FILE': str(uris),
+        'GIFTS_STATUS_POLL_INTERVAL': '0',
+        'RATE_LIMIT_RATE': '0',
+        'RESULT_CACHE_ACTIVE_TTL': '60',
+    })
+    return hives
+
+
+@pytest.fixture(scope='session')
+def app(app_hives):
+    from ensembl.production.gifts.app.main import app
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
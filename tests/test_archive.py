@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import pytest
+
+from ensembl.production.gifts.archive import ArchiveSync, JobArchive
+from ensembl.production.gifts.cache import LRUCache
+from ensembl.production.gifts.hive import PooledHiveInstance
+
+PIPELINE = 'update_ensembl'
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return JobArchive(str(tmp_path / 'archive.db'))
+
+
+@pytest.fixture
+def sync(archive, hive):
+    return ArchiveSync(archive, lambda pipeline: hive, {PIPELINE: 'submit'}, chunk_size=7)
+
+
+def test_archive_is_ready_once_fully_synced(archive, sync):
+    assert not archive.ready(PIPELINE)
+    assert archive.count_jobs(PIPELINE) == 0
+    assert sync.sync(PIPELINE) == 60
+    assert archive.ready(PIPELINE)
+    assert archive.count_jobs(PIPELINE) == 60
+    assert archive.state(PIPELINE)['last_job_id'] == 60
+
+
+def test_sync_is_incremental(archive, sync, hive, seeded_hive):
+    sync.sync(PIPELINE)
+    version = archive.version(PIPELINE)
+    assert sync.sync(PIPELINE) == 0
+    assert archive.version(PIPELINE) == version
+    # Job 4 was READY
+    seeded_hive.set_status(4, 'DONE')
+    hive.create_jobs('submit', [{'ensembl_release': '111', 'tag': 'new'}])
+    assert sync.sync(PIPELINE) == 2
+    assert archive.version(PIPELINE) != version
+    assert archive.get_result(PIPELINE, 61)['input']['tag'] == 'new'
+    assert archive.count_jobs(PIPELINE, status='complete') == 31
+
+
+def test_recent_syncs_are_skipped(sync):
+    assert sync.sync(PIPELINE, max_age=60) == 60
+    assert sync.sync(PIPELINE, max_age=60) is None
+
+
+def test_lists_are_filtered_as_by_the_hive(archive, sync, hive):
+    sync.sync(PIPELINE)
+    for status in ('DONE', 'complete', 'failed', 'RUN', 'submitted'):
+        assert archive.count_jobs(PIPELINE, status=status) == hive.count_jobs('submit', status=status)
+    filters = {'status': 'FAILED', 'ensembl_release': '93', 'limit': 5}
+    assert archive.get_results(PIPELINE, **filters) == hive.get_results('submit', **filters)
+    page = archive.get_results(PIPELINE, limit=3, after_job_id=50, order='asc')
+    assert [job['id'] for job in page] == [51, 52, 53]
+    assert [job['id'] for job in archive.iter_results(PIPELINE, tag='tag3', chunk_size=2)] == \
+        [job['id'] for job in hive.iter_results('submit', tag='tag3')]
+
+
+def test_deleted_jobs_are_not_a_reseed(archive, sync, seeded_hive):
+    sync.sync(PIPELINE)
+    seeded_hive.delete_job(60)
+    seeded_hive.delete_job(1)
+    sync.sync(PIPELINE)
+    assert archive.state(PIPELINE)['epoch'] == 1
+    assert archive.count_jobs(PIPELINE) == 60
+
+
+def test_reseeded_hive_starts_a_new_epoch(archive, sync, hive, seeded_hive):
+    sync.sync(PIPELINE)
+    seeded_hive.execute('DELETE FROM result')
+    seeded_hive.execute('DELETE FROM job')
+    job_ids = hive.create_jobs('submit', [{'ensembl_release': '112', 'tag': 'reseeded'}] * 2)
+    assert job_ids[0] == 1
+    sync.sync(PIPELINE)
+    state = archive.state(PIPELINE)
+    assert state['epoch'] == 2
+    assert archive.ready(PIPELINE)
+    # Jobs of the current epoch are listed first, then earlier ones
+    jobs = archive.get_results(PIPELINE, limit=3)
+    assert [(job['id'], job['input']['tag']) for job in jobs[:2]] == [(2, 'reseeded'), (1, 'reseeded')]
+    assert jobs[2]['id'] == 60
+    assert archive.get_result(PIPELINE, 1)['input']['tag'] == 'reseeded'
+    assert archive.count_jobs(PIPELINE) == 62
+
+
+def test_archived_pipeline_reads_like_a_hive(archive, sync):
+    sync.sync(PIPELINE)
+    pipeline = archive.pipeline(PIPELINE)
+    assert pipeline.count_jobs('submit', status='running') == 10
+    assert pipeline.get_result_for_job_id(6)['status'] == 'complete'
+    assert pipeline.get_result_for_job_id(99) is None
+    assert len(pipeline.get_results('submit', limit=4)) == 4
+
+
+def test_new_epochs_are_not_read_from_cached_results(archive, seeded_hive, monkeypatch):
+    hive = PooledHiveInstance(seeded_hive.url, result_cache=LRUCache('test_archive_results'))
+    sync = ArchiveSync(archive, lambda pipeline: hive, {PIPELINE: 'submit'}, chunk_size=7)
+    try:
+        sync.sync(PIPELINE)
+        assert len(hive.result_cache) == 60
+        seeded_hive.execute('DELETE FROM result')
+        seeded_hive.execute('DELETE FROM job')
+        # More jobs than before, so the highest job_id does not go down
+        hive.create_jobs('submit', [{'ensembl_release': '112', 'tag': 'reseeded'}] * 70)
+        cleared = []
+        clear = hive.clear_result_cache
+        monkeypatch.setattr(hive, 'clear_result_cache', lambda: cleared.append(len(hive.result_cache)) or clear())
+        sync.sync(PIPELINE)
+        assert cleared == [60]
+        assert archive.state(PIPELINE)['epoch'] == 2
+        assert {job['input']['tag'] for job in archive.get_results(PIPELINE, limit=70)} == {'reseeded'}
+    finally:
+        hive.dispose()
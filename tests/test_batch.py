@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError
+
+JSON = {'Content-Type': 'application/json'}
+
+
+def submission(release, environment='test'):
+    return {'ensembl_release': release, 'environment': environment, 'tag': 'batch'}
+
+
+def test_jobs_are_created_in_one_transaction(hive):
+    statements = []
+    event.listen(hive.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    job_ids = hive.create_jobs('submit', [submission(110), submission(111)])
+    assert job_ids == [61, 62]
+    # The jobs are not read back one at a time once committed
+    assert not [sql for sql in statements if sql.lstrip().upper().startswith('SELECT') and 'job.job_id' in sql]
+    assert [hive.get_job_by_id(job_id).status for job_id in job_ids] == ['READY', 'READY']
+
+
+def test_batch_results_match_submissions(client):
+    response = client.post('/update_ensembl/batch', headers=JSON,
+                           json=[submission(110), submission(111, 'unknown'), {'ensembl_release': 112}])
+    assert response.status_code == 200
+    results = response.json
+    assert isinstance(results[0]['job_id'], int)
+    assert 'error' in results[1]
+    assert results[2] == {'error': 'Missing environment'}
+
+
+def test_batch_must_be_a_list(client):
+    response = client.post('/update_ensembl/batch', headers=JSON, json=submission(110))
+    assert response.status_code == 400
+
+
+def test_batch_size_is_capped(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'SUBMIT_BATCH_MAX_SIZE', 2)
+    response = client.post('/update_ensembl/batch', headers=JSON, json=[submission(110)] * 3)
+    assert response.status_code == 400
+
+
+def test_pool_timeouts_fail_the_batch(client, monkeypatch):
+    from ensembl.production.gifts.app import main
+
+    def pool_exhausted(*args):
+        raise TimeoutError('QueuePool limit reached')
+    monkeypatch.setattr(main, 'create_jobs', pool_exhausted)
+    response = client.post('/update_ensembl/batch', headers=JSON, json=[submission(110), submission(111)])
+    assert response.status_code == 200
+    assert [result['error'] for result in response.json] == ['Unable to submit job: QueuePool limit reached'] * 2
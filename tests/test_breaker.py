@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import time
+
+import pytest
+
+from ensembl.production.gifts.breaker import CircuitBreaker, CircuitBreakers, CircuitOpenError, GuardedHive
+
+
+class Backend:
+    def __init__(self):
+        self.up = True
+        self.calls = 0
+
+    def get_version(self):
+        self.calls += 1
+        if not self.up:
+            raise ConnectionError('backend down')
+        return 'v1'
+
+    def iter_results(self):
+        yield 1
+        if not self.up:
+            raise ConnectionError('backend down')
+        yield 2
+
+
+def breaker_for(backend, **options):
+    options = dict({'failure_threshold': 2, 'probe_interval': 0.05}, **options)
+    return CircuitBreaker('test', probe=backend.get_version, is_failure=lambda e: isinstance(e, ConnectionError),
+                          **options)
+
+
+def test_opens_after_consecutive_failures():
+    backend = Backend()
+    hive = GuardedHive(backend, breaker_for(backend, probe_interval=60))
+    backend.up = False
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            hive.get_version()
+    calls = backend.calls
+    with pytest.raises(CircuitOpenError) as error:
+        hive.get_version()
+    assert backend.calls == calls
+    assert error.value.backend == 'test'
+    assert error.value.retry_after >= 1
+
+
+def test_success_resets_the_failure_count():
+    backend = Backend()
+    breaker = breaker_for(backend)
+    hive = GuardedHive(backend, breaker)
+    backend.up = False
+    with pytest.raises(ConnectionError):
+        hive.get_version()
+    backend.up = True
+    assert hive.get_version() == 'v1'
+    assert breaker.failures == 0
+    assert breaker.status()['state'] == 'closed'
+
+
+def test_other_errors_are_not_failures():
+    def bad_query():
+        raise ValueError('bad query')
+
+    breaker = CircuitBreaker('test', probe=lambda: None, is_failure=lambda e: isinstance(e, ConnectionError),
+                             failure_threshold=1)
+    with pytest.raises(ValueError):
+        breaker.call(bad_query)
+    assert breaker.status() == {'state': 'closed', 'failures': 0, 'last_error': None}
+
+
+def test_probe_closes_the_circuit():
+    backend = Backend()
+    breaker = breaker_for(backend)
+    backend.up = False
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(backend.get_version)
+    assert breaker.status()['state'] == 'open'
+    backend.up = True
+    deadline = time.monotonic() + 5
+    while breaker.state == 'open' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert breaker.state == 'closed'
+    assert breaker.call(backend.get_version) == 'v1'
+
+
+def test_errors_while_iterating_are_failures():
+    backend = Backend()
+    breaker = breaker_for(backend, probe_interval=60)
+    hive = GuardedHive(backend, breaker)
+    assert list(hive.iter_results()) == [1, 2]
+    backend.up = False
+    for failures in (1, 2):
+        results = hive.iter_results()
+        # Nothing is queried until the generator is iterated
+        assert breaker.failures == failures - 1
+        with pytest.raises(ConnectionError):
+            list(results)
+        assert breaker.failures == failures
+    with pytest.raises(CircuitOpenError):
+        hive.iter_results()
+
+
+def test_attributes_are_not_wrapped():
+    backend = Backend()
+    hive = GuardedHive(backend, breaker_for(backend))
+    assert hive.up is True
+
+
+def test_open_circuits_serve_the_last_known_response(client, monkeypatch):
+    from ensembl.production.gifts.app import main
+    json_request = {'Content-Type': 'application/json'}
+    assert client.get('/process_mapping/1', headers=json_request).status_code == 200
+
+    def down():
+        raise ConnectionError('hive down')
+    breakers = CircuitBreakers(lambda hive_type: CircuitBreaker(hive_type, probe=down, failure_threshold=1,
+                                                                probe_interval=60))
+    breakers.get('process_mapping').record_failure(ConnectionError('hive down'))
+    monkeypatch.setattr(main, 'hive_breakers', breakers)
+    response = client.get('/process_mapping/1', headers=json_request)
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) > 0
+    assert response.json['backend'] == 'process_mapping'
+    assert response.json['last_known']['status'] == 'complete'
+    assert client.get('/process_mapping/2', headers=json_request).json.get('last_known') is None
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import time
+
+import pytest
+
+from ensembl.production.gifts.cache import LRUCache
+from ensembl.production.gifts.hive import PooledHiveInstance
+
+
+def test_get_set_delete():
+    cache = LRUCache('test')
+    assert cache.get('a') is None
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    cache.delete('a')
+    assert cache.get('a') is None
+    cache.delete('a')
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache('test', maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    # Reading a makes b the least recently used
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_entries_expire_after_ttl():
+    cache = LRUCache('test')
+    cache.set('short', 1, ttl=0.05)
+    cache.set('forever', 2)
+    assert cache.get('short') == 1
+    time.sleep(0.1)
+    assert cache.get('short') is None
+    assert cache.get('forever') == 2
+    assert len(cache) == 1
+
+
+def test_set_replaces_value_and_ttl():
+    cache = LRUCache('test')
+    cache.set('a', 1, ttl=0.05)
+    cache.set('a', 2)
+    time.sleep(0.1)
+    assert cache.get('a') == 2
+
+
+def test_clear():
+    cache = LRUCache('test')
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get('a') is None
+
+
+@pytest.fixture
+def cached_hive(seeded_hive):
+    hive = PooledHiveInstance(seeded_hive.url, result_cache=LRUCache('test_results'), active_result_ttl=60)
+    yield hive
+    hive.dispose()
+
+
+def result(hive, job_id):
+    return hive.get_result_for_job_id(job_id, progress=False)
+
+
+def test_results_of_finished_jobs_are_cached(seeded_hive, cached_hive):
+    complete = result(cached_hive, 1)
+    assert complete['status'] == 'complete'
+    seeded_hive.execute('UPDATE result SET output = ? WHERE job_id = 1', '{"changed": true}')
+    cached_hive.get_version()
+    assert result(cached_hive, 1) == complete
+
+
+def test_results_of_active_jobs_follow_the_version(seeded_hive, cached_hive):
+    cached_hive.get_version()
+    assert result(cached_hive, 4)['status'] == 'submitted'
+    seeded_hive.set_status(4, 'RUN')
+    # The job row read with the result has changed status
+    assert result(cached_hive, 4)['status'] == 'running'
+
+
+def test_cached_results_are_for_the_same_job(seeded_hive, cached_hive):
+    assert result(cached_hive, 1)['status'] == 'complete'
+    # Another job under the same job_id, as after a reseed
+    seeded_hive.delete_job(1)
+    seeded_hive.execute("INSERT INTO job (job_id, input_id, status, param_id_stack, analysis_id) "
+                        "VALUES (1, ?, 'DONE', '', 1)", '{"tag" => "reseeded"}')
+    reseeded = result(cached_hive, 1)
+    assert reseeded['input']['tag'] == 'reseeded'
+
+
+def test_reseeding_clears_the_cache(seeded_hive, cached_hive):
+    cached_hive.get_version()
+    result(cached_hive, 1)
+    assert len(cached_hive.result_cache) == 1
+    for job_id in range(2, 61):
+        seeded_hive.delete_job(job_id)
+    cached_hive.get_version()
+    assert len(cached_hive.result_cache) == 0
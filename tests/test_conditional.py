@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+JSON = {'Content-Type': 'application/json'}
+
+
+def get_page(client, path='/update_ensembl?limit=10', **headers):
+    return client.get(path, headers=dict(JSON, **headers))
+
+
+def test_lists_carry_an_etag(client):
+    response = get_page(client)
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert response.last_modified is not None
+    assert len(response.json['rows']) == 10
+    assert 'Content-Type' in response.vary
+
+
+def test_unchanged_lists_are_not_modified(client):
+    etag = get_page(client).headers['ETag']
+    response = get_page(client, **{'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert not response.data
+
+
+def test_etag_depends_on_the_query(client):
+    assert get_page(client).headers['ETag'] != get_page(client, '/update_ensembl?limit=5').headers['ETag']
+
+
+def test_job_changes_give_a_new_etag(client, app_hives):
+    etag = get_page(client, '/update_ensembl?limit=10&status=running').headers['ETag']
+    app_hives['update_ensembl'].set_status(10, 'RUN')
+    response = get_page(client, '/update_ensembl?limit=10&status=running', **{'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert 10 in [job['id'] for job in response.json['rows']]
+
+
+def test_job_pages_are_conditional(client):
+    response = get_page(client, '/process_mapping/1')
+    assert response.status_code == 200
+    assert response.json['status'] == 'complete'
+    assert response.cache_control.max_age > 0
+    assert get_page(client, '/process_mapping/1', **{'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_offsetting_transitions_give_a_new_etag(client, app_hives):
+    path = '/update_ensembl?limit=10&status=running'
+    response = get_page(client, path)
+    assert 17 in [job['id'] for job in response.json['rows']]
+    # One job starts as another stops: the counts by status are unchanged
+    app_hives['update_ensembl'].set_status(16, 'RUN')
+    app_hives['update_ensembl'].set_status(17, 'READY')
+    changed = get_page(client, path, **{'If-None-Match': response.headers['ETag']})
+    assert changed.status_code == 200
+    running = [job['id'] for job in changed.json['rows']]
+    assert 16 in running and 17 not in running
+
+
+def test_version_is_stable_while_jobs_are_unchanged(hive):
+    version = hive.get_version()
+    assert hive.get_version() == version
+    assert hive.version == version
+
+
+def test_version_changes_with_new_jobs(hive):
+    version = hive.get_version()
+    hive.create_jobs('submit', [{'ensembl_release': '110', 'environment': 'test'}])
+    assert hive.get_version() != version
+
+
+def test_version_follows_status_changes(seeded_hive, hive):
+    version = hive.get_version()
+    seeded_hive.set_status(4, 'RUN')
+    seeded_hive.set_status(5, 'READY')
+    assert hive.get_version() != version
+    seeded_hive.set_status(4, 'READY')
+    seeded_hive.set_status(5, 'RUN')
+    assert hive.get_version() == version
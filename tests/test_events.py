@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import json
+
+from ensembl.production.gifts.events import JobPoller
+
+
+class CountingHive:
+    """ Hive returning results set by the test, counting how often it is queried """
+
+    def __init__(self, results):
+        self.results = results
+        self.queries = 0
+
+    def get_results_for_job_ids(self, ids, progress=False):
+        self.queries += 1
+        return {job_id: self.results[job_id] for job_id in ids if job_id in self.results}
+
+
+def events(response):
+    """ (event, data) pairs of a text/event-stream response """
+    parsed = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if 'event' in fields:
+            parsed.append((fields['event'], json.loads(fields['data'])))
+    return parsed
+
+
+def test_subscribers_share_one_poll():
+    hive = CountingHive({1: {'status': 'running'}})
+    poller = JobPoller(lambda: hive, interval=60)
+    first = poller.subscribe(1)
+    second = poller.subscribe(1)
+    missing = poller.subscribe(2)
+    poller.poll()
+    assert first.get(timeout=1) == second.get(timeout=1) == {'status': 'running'}
+    assert missing.get(timeout=1) is None
+    assert hive.queries <= 2
+
+
+def test_only_changes_are_pushed():
+    hive = CountingHive({1: {'status': 'running'}})
+    poller = JobPoller(lambda: hive, interval=60)
+    subscriber = poller.subscribe(1)
+    poller.poll()
+    poller.poll()
+    assert subscriber.get(timeout=1) == {'status': 'running'}
+    assert subscriber.empty()
+    hive.results[1] = {'status': 'complete'}
+    poller.poll()
+    assert subscriber.get(timeout=1) == {'status': 'complete'}
+
+
+def test_progress_counts_descendants(seeded_hive, hive):
+    for job_id, status, stack in ((101, 'DONE', '4,'), (102, 'FAILED', '4,101'), (103, 'RUN', '4,'),
+                                  (104, 'DONE', '40,')):
+        seeded_hive.execute('INSERT INTO job (job_id, input_id, status, param_id_stack, analysis_id) '
+                            "VALUES (?, '{}', ?, ?, 1)", job_id, status, stack)
+    assert hive.get_all_jobs_progress(4) == {'total': 3, 'inprogress': 1, 'completed': 1, 'failed': 1}
+    assert hive.get_all_jobs_progress(5)['total'] == 0
+
+
+def test_one_event_per_request_without_streaming(client):
+    response = client.get('/process_mapping/1/events')
+    assert response.mimetype == 'text/event-stream'
+    assert response.get_data(as_text=True).startswith('retry: ')
+    (name, job), end = events(response)
+    assert name == 'status' and job['status'] == 'complete'
+    assert end[0] == 'end'
+    assert events(client.get('/process_mapping/1000/events'))[0][0] == 'error'
+
+
+def test_reconnections_are_served_from_the_last_read(client, app_hives):
+    from ensembl.production.gifts.app import main
+    path = '/update_ensembl/28/events'
+    assert events(client.get(path))[0][1]['status'] == 'submitted'
+    app_hives['update_ensembl'].set_status(28, 'FAILED')
+    # Clients reconnecting within the event interval do not query the hive
+    assert events(client.get(path))[0][1]['status'] == 'submitted'
+    main.job_events_cache.clear()
+    assert events(client.get(path))[0][1]['status'] == 'failed'
+
+
+def test_streams_end_with_the_job(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'JOB_EVENTS_STREAMING', True)
+    response = client.get('/process_mapping/2/events')
+    assert response.is_streamed
+    assert [name for name, _ in events(response)] == ['status', 'end']
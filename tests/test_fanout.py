@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import concurrent.futures
+import threading
+import time
+
+from ensembl.production.gifts import fanout
+from ensembl.production.gifts.fanout import FanOut
+
+
+def sleeper(seconds, result=None):
+    def call():
+        time.sleep(seconds)
+        return result
+    return call
+
+
+def failing():
+    raise RuntimeError('backend down')
+
+
+def test_calls_run_concurrently():
+    start = time.monotonic()
+    results = FanOut().run({name: (sleeper(0.2, name), 5) for name in ('a', 'b', 'c')})
+    assert time.monotonic() - start < 0.5
+    assert {name: result['result'] for name, result in results.items()} == {'a': 'a', 'b': 'b', 'c': 'c'}
+    assert all(result['elapsed'] >= 0.2 for result in results.values())
+
+
+def test_errors_are_reported_per_call():
+    results = FanOut().run({'ok': (sleeper(0, 1), 5), 'down': (failing, 5)})
+    assert results['ok']['result'] == 1
+    assert results['down']['error'] == 'backend down'
+
+
+def test_slow_calls_time_out_alone():
+    release = threading.Event()
+    start = time.monotonic()
+    try:
+        results = FanOut().run({'slow': (release.wait, 0.1), 'fast': (sleeper(0, 'fast'), 5)})
+    finally:
+        release.set()
+    assert time.monotonic() - start < 1
+    assert results['slow'] == {'error': 'Timed out after 0.1s', 'elapsed': 0.1}
+    assert results['fast']['result'] == 'fast'
+
+
+def test_futures_timeouts_are_caught():
+    # Before Python 3.11 the futures' TimeoutError is not the builtin one
+    assert fanout.FutureTimeoutError is concurrent.futures.TimeoutError
+
+
+def test_overview(client):
+    response = client.get('/overview', headers={'Content-Type': 'application/json'})
+    assert response.status_code == 200
+    overview = response.json
+    assert overview['environments']['test']['result']['running'] is None
+    assert overview['pipelines']['process_mapping']['result']['total'] == 60
+    assert overview['pipelines']['process_mapping']['result']['latest']['job_id'] == 60
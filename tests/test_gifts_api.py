@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import json
+import os
+import time
+
+import pytest
+
+from ensembl.production.gifts.gifts_api import GIFTsApiUris, GIFTsServiceError, GIFTsStatusClient, GIFTsStatusPoller, \
+    running_pipeline
+from standins import StatusStub
+
+
+@pytest.fixture
+def uris_file(tmp_path):
+    path = tmp_path / 'gifts_api_uris.json'
+    path.write_text(json.dumps({'staging': 'http://staging'}))
+    return path
+
+
+def rewrite(path, content):
+    path.write_text(content)
+    # Make sure the file stamp changes even within the mtime resolution
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+
+
+def test_resolves_environments(uris_file):
+    uris = GIFTsApiUris(str(uris_file))
+    assert uris.resolve('staging') == 'http://staging'
+    with pytest.raises(RuntimeError):
+        uris.resolve('production')
+
+
+def test_file_is_read_only_when_changed(uris_file):
+    uris = GIFTsApiUris(str(uris_file), check_interval=0)
+    for _ in range(3):
+        uris.resolve('staging')
+    assert uris.reloads == 1
+    rewrite(uris_file, json.dumps({'staging': 'http://staging', 'production': 'http://production'}))
+    assert uris.resolve('production') == 'http://production'
+    assert uris.reloads == 2
+
+
+def test_changes_are_checked_at_most_every_interval(uris_file):
+    uris = GIFTsApiUris(str(uris_file), check_interval=60)
+    uris.resolve('staging')
+    rewrite(uris_file, json.dumps({'production': 'http://production'}))
+    assert uris.resolve('staging') == 'http://staging'
+    assert uris.reloads == 1
+
+
+def test_broken_file_keeps_the_last_good_map(uris_file):
+    uris = GIFTsApiUris(str(uris_file), check_interval=0)
+    uris.resolve('staging')
+    rewrite(uris_file, '{"staging": ')
+    assert uris.resolve('staging') == 'http://staging'
+    assert uris.failed_reloads == 1
+    uris_file.unlink()
+    assert uris.resolve('staging') == 'http://staging'
+
+
+def test_missing_file_fails_the_first_read(tmp_path):
+    with pytest.raises(OSError):
+        GIFTsApiUris(str(tmp_path / 'missing.json')).resolve('staging')
+    (tmp_path / 'list.json').write_text('[]')
+    with pytest.raises(ValueError):
+        GIFTsApiUris(str(tmp_path / 'list.json')).resolve('staging')
+
+
+def test_status_is_cached(status_stub):
+    client = GIFTsStatusClient(cache_ttl=60)
+    status, age = client.get_status(status_stub.url)
+    assert status == {'update_ensembl': False, 'process_mapping': False}
+    assert age == 0.0
+    assert running_pipeline(status) is None
+    status_stub.running = 'process_mapping'
+    try:
+        cached, age = client.get_status(status_stub.url)
+        assert cached == status
+        assert age > 0
+        assert running_pipeline(client.fetch_status(status_stub.url)) == 'Process mapping'
+    finally:
+        status_stub.running = None
+
+
+def test_unreachable_server():
+    client = GIFTsStatusClient(connect_timeout=0.5, retries=0)
+    with pytest.raises(GIFTsServiceError):
+        client.get_status('http://127.0.0.1:9')
+    assert client.last_status('http://127.0.0.1:9') is None
+
+
+def test_checks_are_bounded_by_max_duration():
+    client = GIFTsStatusClient(connect_timeout=3.05, read_timeout=10, retries=2, max_duration=20)
+    assert client.retries == 0
+    assert GIFTsStatusClient.worst_case(3.05, *client.timeout[1:], client.retries, 0.5) <= 20
+    client = GIFTsStatusClient(connect_timeout=1, read_timeout=60, retries=0, max_duration=5)
+    assert client.timeout == (1, 4)
+    client = GIFTsStatusClient()
+    assert GIFTsStatusClient.worst_case(*client.timeout, client.retries, client.backoff_factor) < 30
+
+
+def test_slow_server_times_out():
+    with StatusStub(delay=2) as stub:
+        client = GIFTsStatusClient(read_timeout=0.2, retries=0)
+        start = time.monotonic()
+        with pytest.raises(GIFTsServiceError):
+            client.fetch_status(stub.url)
+        assert time.monotonic() - start < 1.5
+
+
+def wait_for_snapshot(poller, rest_server, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        snapshot = poller.snapshot(rest_server)
+        if snapshot is not None:
+            return snapshot
+        time.sleep(0.01)
+    raise AssertionError(f'{rest_server} was not polled')
+
+
+def test_poller_keeps_a_snapshot_per_server(tmp_path, status_stub):
+    path = tmp_path / 'gifts_api_uris.json'
+    path.write_text(json.dumps({'test': status_stub.url, 'down': 'http://127.0.0.1:9'}))
+    client = GIFTsStatusClient(connect_timeout=0.5, retries=0)
+    poller = GIFTsStatusPoller(client, GIFTsApiUris(str(path), check_interval=0), interval=60)
+    pipeline_status, error, age = wait_for_snapshot(poller, status_stub.url)
+    assert pipeline_status == {'update_ensembl': False, 'process_mapping': False}
+    assert error is None
+    assert age < 60
+    pipeline_status, error, _ = wait_for_snapshot(poller, 'http://127.0.0.1:9')
+    assert pipeline_status is None and error
+    # Servers removed from the map are no longer polled
+    rewrite(path, json.dumps({'test': status_stub.url}))
+    assert poller.snapshot('http://127.0.0.1:9') is None
+    assert poller.snapshot('http://unknown') is None
+
+
+def test_submissions_use_recent_snapshots(app, monkeypatch):
+    from ensembl.production.gifts.app import main
+
+    class Poller:
+        def snapshot(self, rest_server):
+            return {'update_ensembl': True, 'process_mapping': False}, None, 1.0
+    monkeypatch.setattr(main, 'status_poller', Poller())
+    # Checked without calling the server
+    assert main.get_status('http://127.0.0.1:9') == 'Update ensembl'
+    monkeypatch.setitem(app.config, 'GIFTS_STATUS_MAX_STALENESS', 0.5)
+    # Stale snapshots are checked live
+    assert main.get_status('http://127.0.0.1:9').startswith('Unable to retrieve status')
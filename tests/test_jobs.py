@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+from sqlalchemy import event
+
+
+def test_results_are_fetched_in_chunks(hive):
+    statements = []
+    event.listen(hive.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    results = hive.get_results_for_job_ids(range(1, 26), chunk_size=10)
+    assert sorted(results) == list(range(1, 26))
+    assert results[1]['status'] == 'complete'
+    assert results[3]['status'] == 'failed'
+    assert len([sql for sql in statements if 'job.job_id IN' in sql]) == 3
+
+
+def test_unknown_jobs_are_left_out(hive):
+    assert sorted(hive.get_results_for_job_ids([59, 60, 61, 1000])) == [59, 60]
+
+
+def test_jobs_of_every_pipeline(client):
+    response = client.get('/jobs?ids=3,1&ids=2,1000')
+    assert response.status_code == 200
+    results = response.json
+    assert sorted(results) == ['process_mapping', 'update_ensembl']
+    jobs = results['process_mapping']
+    assert sorted(jobs) == ['1', '1000', '2', '3']
+    assert jobs['1']['status'] == 'complete'
+    assert jobs['1000'] is None
+
+
+def test_jobs_of_one_pipeline(client):
+    response = client.get('/jobs?ids=1&pipeline=process_mapping')
+    assert list(response.json) == ['process_mapping']
+
+
+def test_job_ids_are_validated(client):
+    assert client.get('/jobs?ids=1,x').status_code == 400
+    assert client.get('/jobs?ids=1&pipeline=unknown').status_code == 400
+
+
+def test_job_ids_are_capped(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'JOBS_MAX_IDS', 2)
+    assert client.get('/jobs?ids=1,2,3&pipeline=process_mapping').status_code == 400
+    # Repeated ids only count once
+    assert client.get('/jobs?ids=1,2,2,1&pipeline=process_mapping').status_code == 200
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+
+from ensembl.production.gifts.metrics import InstrumentedHive
+
+
+class SlowHive:
+    version = 'v1'
+
+    def get_version(self):
+        return self.version
+
+    def fail(self):
+        raise RuntimeError('hive down')
+
+    def iter_results(self):
+        for job_id in range(3):
+            time.sleep(0.01)
+            yield job_id
+
+
+def observations(operation, suffix='count'):
+    return REGISTRY.get_sample_value(f'gifts_hive_query_duration_seconds_{suffix}',
+                                     {'pipeline': 'metrics_test', 'operation': operation}) or 0
+
+
+def test_calls_are_timed():
+    hive = InstrumentedHive(SlowHive(), 'metrics_test')
+    before = observations('get_version')
+    assert hive.get_version() == 'v1'
+    assert observations('get_version') == before + 1
+    # Attributes are passed through untimed
+    assert hive.version == 'v1'
+
+
+def test_failed_calls_are_timed():
+    hive = InstrumentedHive(SlowHive(), 'metrics_test')
+    before = observations('fail')
+    with pytest.raises(RuntimeError):
+        hive.fail()
+    assert observations('fail') == before + 1
+
+
+def test_generators_are_timed_once_exhausted():
+    hive = InstrumentedHive(SlowHive(), 'metrics_test')
+    before_count, before_sum = observations('iter_results'), observations('iter_results', 'sum')
+    results = hive.iter_results()
+    assert observations('iter_results') == before_count
+    consumed = []
+    for job_id in results:
+        # Time spent by the consumer is not the hive's
+        time.sleep(0.05)
+        consumed.append(job_id)
+    assert consumed == [0, 1, 2]
+    assert observations('iter_results') == before_count + 1
+    assert 0.03 <= observations('iter_results', 'sum') - before_sum < 0.15
+
+
+def test_abandoned_generators_are_timed_when_closed():
+    hive = InstrumentedHive(SlowHive(), 'metrics_test')
+    before = observations('iter_results')
+    results = hive.iter_results()
+    next(results)
+    results.close()
+    assert observations('iter_results') == before + 1
+
+
+def test_metrics_endpoint(client):
+    assert client.get('/process_mapping?limit=1', headers={'Content-Type': 'application/json'}).status_code == 200
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert 'gifts_request_duration_seconds_bucket{endpoint="process_mapping_list"' in text
+    assert 'gifts_hive_query_duration_seconds_count{operation="get_results",pipeline="process_mapping"}' in text
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+JSON = {'Content-Type': 'application/json'}
+
+
+def get_jobs(client, query=''):
+    response = client.get(f'/process_mapping?{query}', headers=JSON)
+    assert response.status_code == 200
+    return response.json
+
+
+def test_whole_list_in_job_id_order(client):
+    jobs = get_jobs(client)
+    assert [job['id'] for job in jobs] == list(range(1, 61))
+    assert [job['id'] for job in get_jobs(client, 'order=desc')][:2] == [60, 59]
+
+
+def test_pages_are_newest_first(client):
+    page = get_jobs(client, 'limit=5')
+    assert page['total'] == 60
+    assert [job['id'] for job in page['rows']] == [60, 59, 58, 57, 56]
+    page = get_jobs(client, 'limit=5&offset=5&order=asc')
+    assert [job['id'] for job in page['rows']] == [6, 7, 8, 9, 10]
+
+
+def test_keyset_pagination(client):
+    assert [job['id'] for job in get_jobs(client, 'limit=3&after_job_id=10')['rows']] == [9, 8, 7]
+    assert [job['id'] for job in get_jobs(client, 'limit=3&after_job_id=10&order=asc')['rows']] == [11, 12, 13]
+
+
+def test_filters(client):
+    page = get_jobs(client, 'limit=100&status=failed')
+    assert page['total'] == 10
+    assert {job['status'] for job in page['rows']} == {'failed'}
+    assert get_jobs(client, 'limit=1&status=FAILED')['total'] == 10
+    page = get_jobs(client, 'limit=100&ensembl_release=95')
+    assert [job['id'] for job in page['rows']] == [45, 25, 5]
+    page = get_jobs(client, 'limit=100&tag=tag3&status=complete')
+    assert all(job['input']['tag'] == 'tag3' and job['status'] == 'complete' for job in page['rows'])
+    assert page['total'] == len(page['rows']) == 3
+    assert [job['id'] for job in get_jobs(client, 'status=RUN&ensembl_release=95')] == [5]
+
+
+def test_list_view_loads_rows_a_page_at_a_time(client):
+    response = client.get('/process_mapping?status=failed')
+    assert response.status_code == 200
+    assert b'data-side-pagination="server"' in response.data
+    assert b'status=failed' in response.data
+    assert b'data-side-pagination="client"' in client.get('/process_mapping?stream=1').data
+
+
+def test_hive_filters_accept_both_status_names(hive):
+    assert hive.count_jobs('submit', status='DONE') == hive.count_jobs('submit', status='complete') == 30
+    assert hive.count_jobs('submit', status='running') == 10
+    assert hive.count_jobs('submit', ensembl_release=95, tag='tag3') == 1
+    assert [job['id'] for job in hive.get_results('submit', limit=2, offset=1, order='asc')] == [2, 3]
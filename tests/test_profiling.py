@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import logging
+import time
+
+from sqlalchemy import text
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from ensembl.production.gifts.profiling import ProfilingMiddleware, RequestTimings, timed
+
+logger = logging.getLogger('test_profiling')
+
+
+def make_app(hive=None):
+    def app(environ, start_response):
+        with timed('http'):
+            time.sleep(0.01)
+        if hive is not None:
+            with hive.engine.connect() as connection:
+                connection.execute(text('SELECT COUNT(*) FROM job'))
+
+        def body():
+            # Time spent streaming the response counts towards the request
+            time.sleep(0.02)
+            yield b'ok'
+        return Response(body())(environ, start_response)
+    return app
+
+
+def test_breakdown_by_kind():
+    timings = RequestTimings()
+    timings.add('sql', 0.25)
+    timings.add('sql', 0.25)
+    assert timings.breakdown(1.0) == 'sql 0.500s (2), http 0.000s (0), template 0.000s (0), other 0.500s'
+    assert timings.server_timing().startswith('sql;dur=500.0;desc="2 calls"')
+
+
+def test_timing_outside_requests_is_ignored():
+    with timed('sql'):
+        pass
+
+
+def test_slow_requests_are_logged(caplog, hive):
+    client = Client(ProfilingMiddleware(make_app(hive), logger, slow_threshold=0.01))
+    with caplog.at_level(logging.WARNING, logger='test_profiling'):
+        # Buffered, so that the response is closed and the request finished
+        response = client.get('/jobs?ids=1', buffered=True)
+        assert response.get_data() == b'ok'
+    message, = [record.getMessage() for record in caplog.records]
+    assert message.startswith('Slow request GET /jobs?ids=1 200 ')
+    assert 'sql 0.' in message and '(1)' in message
+
+
+def test_fast_requests_are_not_logged(caplog):
+    client = Client(ProfilingMiddleware(make_app(), logger, slow_threshold=10))
+    with caplog.at_level(logging.INFO, logger='test_profiling'):
+        client.get('/', buffered=True)
+    assert not caplog.records
+
+
+def test_requested_profiles(tmp_path):
+    client = Client(ProfilingMiddleware(make_app(), logger, header='X-Profile', profile_dir=str(tmp_path)))
+    response = client.get('/', headers={'X-Profile': '1'}, buffered=True)
+    assert response.headers['Server-Timing'].startswith('sql;dur=')
+    assert len(list(tmp_path.glob('*-GET-root.prof'))) == 1
+    assert 'Server-Timing' not in client.get('/', buffered=True).headers
+    assert len(list(tmp_path.glob('*.prof'))) == 1
+
+
+def test_sampled_profiles_are_logged(caplog):
+    client = Client(ProfilingMiddleware(make_app(), logger, sample_rate=1.0))
+    with caplog.at_level(logging.INFO, logger='test_profiling'):
+        client.get('/', buffered=True)
+    message, = [record.getMessage() for record in caplog.records]
+    assert message.startswith('Profiled request GET / 200')
+    assert 'function calls' in message
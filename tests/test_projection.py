@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import json
+
+JSON = {'Content-Type': 'application/json'}
+
+FIELDS = 'fields=id,status&fields=input.tag,output.missing'
+
+
+def test_project(app):
+    from ensembl.production.gifts.app.main import project
+    job = {'id': 1, 'status': 'complete', 'input': {'tag': 'a', 'email': 'e'}, 'output': None}
+    assert project(job, ['id', 'input.tag', 'output.timestamp', 'missing']) == {'id': 1, 'input': {'tag': 'a'}}
+
+
+def test_pages_are_projected(client):
+    page = client.get(f'/process_mapping?limit=2&{FIELDS}', headers=JSON).json
+    assert page['total'] == 60
+    assert page['rows'] == [{'id': 60, 'status': 'complete', 'input': {'tag': 'tag4'}},
+                            {'id': 59, 'status': 'running', 'input': {'tag': 'tag3'}}]
+    # Projection is applied after the page cache, which whole rows are served from
+    assert set(client.get('/process_mapping?limit=2', headers=JSON).json['rows'][0]) > {'id', 'status', 'input'}
+
+
+def test_streamed_lists_are_projected(client):
+    jobs = json.loads(client.get(f'/process_mapping?{FIELDS}', headers=JSON).get_data(as_text=True))
+    assert len(jobs) == 60
+    assert all(set(job) == {'id', 'status', 'input'} for job in jobs)
+    lines = client.get(f'/process_mapping?order=asc&{FIELDS}',
+                       headers={'Accept': 'application/x-ndjson'}).get_data(as_text=True).splitlines()
+    assert json.loads(lines[0]) == {'id': 1, 'status': 'complete', 'input': {'tag': 'tag1'}}
+
+
+def test_table_columns(client):
+    html = client.get('/process_mapping?limit=25').get_data(as_text=True)
+    assert 'data-query-params="jobListParams"' in html
+    assert 'data-virtual-scroll="true"' in html
+    # Rows are fetched from the server rather than rendered in the page
+    assert '<td>' not in html
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import os
+
+from ensembl.production.gifts.registry import HiveRegistry
+
+
+def test_one_instance_per_pipeline(seeded_hive):
+    registry = HiveRegistry()
+    hive = registry.get('update_ensembl', seeded_hive.url)
+    assert registry.get('update_ensembl', seeded_hive.url) is hive
+    assert registry.get('process_mapping', seeded_hive.url) is not hive
+    registry.reset()
+
+
+def test_new_instance_when_url_changes(seeded_hive, tmp_path):
+    registry = HiveRegistry()
+    hive = registry.get('update_ensembl', seeded_hive.url)
+    other = registry.get('update_ensembl', f'sqlite:///{tmp_path / "other.db"}')
+    assert other is not hive
+    assert other.url != hive.url
+    registry.reset()
+
+
+def test_instances_are_dropped_in_a_forked_process(seeded_hive):
+    registry = HiveRegistry()
+    hive = registry.get('update_ensembl', seeded_hive.url)
+    # As seen from a child process forked after the instance was created
+    registry._pid = os.getpid() + 1
+    assert registry.get('update_ensembl', seeded_hive.url) is not hive
+    assert registry._pid == os.getpid()
+    registry.reset()
+
+
+def test_options_and_result_cache(seeded_hive):
+    registry = HiveRegistry(result_cache_size=10, active_result_ttl=1)
+    registry.configure(pool_size=2)
+    hive = registry.get('update_ensembl', seeded_hive.url)
+    assert hive.result_cache is not None
+    assert hive.result_cache.maxsize == 10
+    assert hive.active_result_ttl == 1
+    assert registry.options == {'active_result_ttl': 1, 'pool_size': 2}
+    assert registry.get('process_mapping', seeded_hive.url).result_cache is not hive.result_cache
+    registry.reset()
+    assert HiveRegistry().get('update_ensembl', seeded_hive.url).result_cache is None
+
+
+def test_instances_read_their_own_database(tmp_path):
+    from conftest import SeededHive
+    registry = HiveRegistry()
+    update_ensembl = registry.get('update_ensembl', SeededHive(str(tmp_path / 'ue.db'), jobs=6).url)
+    process_mapping = registry.get('process_mapping', SeededHive(str(tmp_path / 'pm.db'), jobs=12).url)
+    assert update_ensembl.count_jobs('submit') == 6
+    assert process_mapping.count_jobs('submit') == 12
+    assert update_ensembl.get_result_for_job_id(6)['status'] == 'complete'
+    assert sorted(job['id'] for job in process_mapping.get_all_results('submit', child=True)) == list(range(1, 13))
+    # Calls of the core HiveInstance would query its module-level session
+    assert not hasattr(update_ensembl, 'delete_job')
+    assert not hasattr(update_ensembl, 'get_jobs_failure_msg')
+    registry.reset()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import os
+import subprocess
+import sys
+
+from flask import Flask
+
+from ensembl.production.gifts.swagger import LazySwagger
+
+SPEC = """
+openapi: 3.0.0
+info:
+  title: Test
+  version: "1"
+paths: {}
+"""
+
+
+def test_specification_is_read_on_first_use(tmp_path, monkeypatch):
+    (tmp_path / 'swagger.yml').write_text(SPEC)
+    app = Flask(__name__, root_path=str(tmp_path))
+    reads = []
+    load = LazySwagger.load_swagger_file
+    monkeypatch.setattr(LazySwagger, 'load_swagger_file', lambda self, path: reads.append(path) or load(self, path))
+    LazySwagger(app, template_file='swagger.yml')
+    assert reads == []
+    client = app.test_client()
+    for _ in range(2):
+        response = client.get('/apispec_1.json')
+        assert response.status_code == 200
+        assert response.json['info']['title'] == 'Test'
+    assert reads == ['swagger.yml']
+
+
+def test_app_specification(client):
+    response = client.get('/apispec_1.json')
+    assert response.status_code == 200
+    assert '/update_ensembl/batch' in response.json['paths']
+
+
+def test_heavy_modules_are_imported_on_first_use(app_hives):
+    # In a fresh interpreter, as other tests use these modules
+    script = ('import sys; from ensembl.production.gifts.app import main; '
+              'print(sorted(name for name in ("sqlalchemy", "ensembl.production.gifts.forms") if name in sys.modules))')
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    output = subprocess.run([sys.executable, '-c', script], check=True, capture_output=True, text=True,
+                            env=env).stdout
+    assert output.splitlines()[-1] == '[]'
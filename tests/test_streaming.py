@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import json
+
+from sqlalchemy import event
+
+JSON = {'Content-Type': 'application/json'}
+
+
+def test_whole_lists_are_streamed_as_a_json_array(client):
+    response = client.get('/process_mapping', headers=JSON)
+    assert response.is_streamed
+    jobs = json.loads(response.get_data(as_text=True))
+    assert [job['id'] for job in jobs] == list(range(1, 61))
+
+
+def test_empty_lists_are_valid_json(client):
+    response = client.get('/process_mapping?ensembl_release=1', headers=JSON)
+    assert json.loads(response.get_data(as_text=True)) == []
+
+
+def test_ndjson_lines(client):
+    response = client.get('/process_mapping?status=failed&order=asc', headers={'Accept': 'application/x-ndjson'})
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    jobs = [json.loads(line) for line in lines]
+    assert [job['id'] for job in jobs] == list(range(3, 61, 6))
+    assert {job['status'] for job in jobs} == {'failed'}
+
+
+def test_streamed_jobs_match_pages(hive):
+    streamed = list(hive.iter_results('submit', order='asc', chunk_size=7))
+    assert streamed == hive.get_results('submit', order='asc')
+    assert len(streamed) == 60
+
+
+def test_abandoned_streams_release_their_connection(hive):
+    connections = []
+    event.listen(hive.engine, 'checkout', lambda *args: connections.append(1))
+    event.listen(hive.engine, 'checkin', lambda *args: connections.pop())
+    results = hive.iter_results('submit')
+    next(results)
+    assert connections
+    results.close()
+    assert not connections
+
+
+def test_chunks_are_buffered(app):
+    from ensembl.production.gifts.app.main import buffered
+    chunks = list(buffered((str(i) for i in range(250)), size=100))
+    assert len(chunks) == 3
+    assert ''.join(chunks) == ''.join(str(i) for i in range(250))
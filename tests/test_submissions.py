@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from ensembl.production.gifts.submissions import SubmissionQueue, SubmissionWorker, TOKEN_KEY, idempotency_key
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SubmissionQueue(str(tmp_path / 'queue.db'))
+
+
+def hive_down(*args):
+    raise OperationalError('INSERT', {}, ConnectionError('hive down'))
+
+
+def is_transient(error):
+    return isinstance(error, OperationalError)
+
+
+def test_idempotency_key():
+    payload = {'ensembl_release': 110, 'environment': 'staging', 'tag': 'a', 'email': 'a@example.org'}
+    key = idempotency_key('update_ensembl', payload)
+    assert key == idempotency_key('update_ensembl', dict(payload, ensembl_release='110', email='b@example.org'))
+    assert key != idempotency_key('process_mapping', payload)
+    assert key != idempotency_key('update_ensembl', dict(payload, tag=None))
+    assert idempotency_key('update_ensembl', payload, 'abc') == 'client:update_ensembl:abc'
+
+
+def test_repeated_submissions_are_deduplicated(queue):
+    submission, created = queue.enqueue('update_ensembl', 'submit', {'ensembl_release': '110'}, 'key')
+    assert created
+    assert submission['status'] == 'queued'
+    again, created = queue.enqueue('update_ensembl', 'submit', {'ensembl_release': '110'}, 'key')
+    assert not created
+    assert again['submission_id'] == submission['submission_id']
+    queue.finish({submission['submission_id']: {'error': 'rejected'}})
+    # A failed submission can be made again
+    _, created = queue.enqueue('update_ensembl', 'submit', {'ensembl_release': '110'}, 'key')
+    assert created
+
+
+def test_claims_are_exclusive_and_expire(tmp_path):
+    queue = SubmissionQueue(str(tmp_path / 'queue.db'), claim_timeout=0.1)
+    for key in ('a', 'b', 'c'):
+        queue.enqueue('update_ensembl', 'submit', {'tag': key}, key)
+    claimed = queue.claim(2)
+    assert [submission['payload']['tag'] for submission in claimed] == ['a', 'b']
+    assert all(submission['attempts'] == 1 for submission in claimed)
+    assert [submission['payload']['tag'] for submission in queue.claim(10)] == ['c']
+    assert queue.claim(10) == []
+    assert queue.get(1)['status'] == 'queued'
+    queue.finish({1: {'job_id': 7}})
+    assert queue.get(1)['status'] == 'submitted'
+    assert queue.get(1)['job_id'] == 7
+    # Finished submissions are not released, expired claims are handed out again
+    queue.release([1, 2])
+    time.sleep(0.15)
+    assert sorted((submission['submission_id'], submission['attempts']) for submission in queue.claim(10)) == \
+        [(2, 2), (3, 2)]
+
+
+def test_worker_submits_batches_to_the_hive(queue, hive):
+    for release in ('108', '109', '110'):
+        queue.enqueue('update_ensembl', 'submit', {'ensembl_release': release}, release)
+    worker = SubmissionWorker(queue, lambda pipeline, analysis, payloads: [
+        {'job_id': job_id} for job_id in hive.create_jobs(analysis, payloads)], batch_size=2)
+    assert worker.drain() == 3
+    job_ids = [queue.get(submission_id)['job_id'] for submission_id in (1, 2, 3)]
+    assert job_ids == [61, 62, 63]
+    assert hive.get_result_for_job_id(63, progress=False)['input']['ensembl_release'] == '110'
+    assert TOKEN_KEY in hive.get_result_for_job_id(63, progress=False)['input']
+
+
+def test_transient_errors_are_retried(queue):
+    queue.enqueue('update_ensembl', 'submit', {'ensembl_release': '110'}, 'key')
+    with pytest.raises(OperationalError):
+        SubmissionWorker(queue, hive_down, is_transient=is_transient).drain()
+    assert queue.get(1)['status'] == 'queued'
+    worker = SubmissionWorker(queue, lambda pipeline, analysis, payloads: [{'job_id': 1}], is_transient=is_transient)
+    assert worker.drain() == 1
+    assert queue.get(1)['status'] == 'submitted'
+
+
+def test_rejected_submissions_fail_alone(queue):
+    for tag in ('good', 'bad', 'fine'):
+        queue.enqueue('update_ensembl', 'submit', {'tag': tag}, tag)
+    submitted = []
+
+    def submit(pipeline, analysis, payloads):
+        if any(payload['tag'] == 'bad' for payload in payloads):
+            raise ValueError('Invalid payload')
+        submitted.extend(payload['tag'] for payload in payloads)
+        return [{'job_id': len(submitted)} for _ in payloads]
+
+    assert SubmissionWorker(queue, submit, is_transient=is_transient).drain() == 3
+    assert [queue.get(submission_id)['status'] for submission_id in (1, 2, 3)] == ['submitted', 'failed', 'submitted']
+    assert queue.get(2)['error'] == 'Invalid payload'
+    assert submitted == ['good', 'fine']
+
+
+def test_jobs_created_before_a_crash_are_not_submitted_again(tmp_path, hive):
+    queue = SubmissionQueue(str(tmp_path / 'queue.db'), claim_timeout=0)
+    queue.enqueue('update_ensembl', 'submit', {'ensembl_release': '110'}, 'key')
+    # The worker creating the job dies before recording it
+    claimed = queue.claim(1)[0]
+    job_id = hive.create_jobs('submit', [dict(claimed['payload'], **{TOKEN_KEY: claimed['token']})])[0]
+
+    def submit(*args):
+        raise AssertionError('Submitted twice')
+
+    worker = SubmissionWorker(queue, submit, find_submitted=lambda pipeline, analysis, *args:
+                              hive.find_jobs(analysis, *args))
+    assert worker.drain() == 1
+    assert queue.get(1)['status'] == 'submitted'
+    assert queue.get(1)['job_id'] == job_id
+
+
+def test_find_jobs_by_input(hive):
+    job_ids = hive.create_jobs('submit', [{'ensembl_release': '110', TOKEN_KEY: 'abc'},
+                                          {'ensembl_release': '110', TOKEN_KEY: 'def'}])
+    assert hive.find_jobs('submit', TOKEN_KEY, ['abc', 'xyz']) == {'abc': job_ids[0]}
+    assert hive.find_jobs('submit', TOKEN_KEY, ['ab']) == {}
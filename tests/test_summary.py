@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import pytest
+
+from ensembl.production.gifts.summary import JobSummary
+
+
+@pytest.fixture
+def summary(hive):
+    return JobSummary(lambda: hive, 'submit')
+
+
+def test_counts_match_the_hive(summary, hive):
+    counts = summary.summary()
+    assert counts['total'] == 60
+    assert counts['last_job_id'] == 60
+    assert counts['by_status'] == hive.count_jobs_by_status('submit') == \
+        {'complete': 30, 'failed': 10, 'submitted': 10, 'running': 10}
+    # Releases 90 to 109, three jobs each
+    assert len(counts['by_release']) == 20
+    release = counts['by_release']['95']
+    assert release['total'] == 3
+    assert release['latest']['job_id'] == 45
+    assert release['latest']['tag'] == 'tag3'
+    assert summary.rebuilds == 1
+
+
+def test_refreshed_incrementally(summary, hive, seeded_hive):
+    summary.summary()
+    # Job 4 was READY, job 5 RUN
+    seeded_hive.set_status(4, 'RUN')
+    seeded_hive.set_status(5, 'DONE')
+    hive.create_jobs('submit', [{'ensembl_release': '95', 'tag': 'new'}])
+    counts = summary.summary()
+    assert counts['by_status'] == {'complete': 31, 'failed': 10, 'submitted': 10, 'running': 10}
+    assert counts['by_release']['95']['latest']['job_id'] == 61
+    assert counts['by_release']['95']['latest']['status'] == 'submitted'
+    assert summary.rebuilds == 1
+
+
+def test_unchanged_version_is_not_refreshed(summary, seeded_hive):
+    summary.summary(version='v1')
+    seeded_hive.set_status(4, 'RUN')
+    assert summary.summary(version='v1')['by_status']['running'] == 10
+    assert summary.summary(version='v2')['by_status']['running'] == 11
+
+
+def test_rebuilt_when_finished_jobs_change(summary, seeded_hive):
+    summary.summary()
+    # A finished job reset by hand is not rechecked incrementally
+    seeded_hive.set_status(6, 'READY')
+    counts = summary.summary()
+    assert counts['by_status']['complete'] == 29
+    assert counts['by_status']['submitted'] == 11
+    assert summary.rebuilds == 2
+
+
+def test_summary_endpoint(client):
+    response = client.get('/process_mapping/summary', headers={'Content-Type': 'application/json'})
+    assert response.status_code == 200
+    assert response.json['total'] == 60
+    assert response.json['by_status']['failed'] == 10
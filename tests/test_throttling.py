@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# .. See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import threading
+import time
+
+import pytest
+
+from ensembl.production.gifts.throttling import SingleFlight, TokenBuckets
+
+
+def test_bucket_allows_burst_then_limits():
+    buckets = TokenBuckets(rate=1, burst=3)
+    assert [buckets.acquire('client') for _ in range(3)] == [0, 0, 0]
+    assert buckets.acquire('client') == 1
+    # Other clients have their own bucket
+    assert buckets.acquire('other') == 0
+
+
+def test_bucket_refills_over_time():
+    buckets = TokenBuckets(rate=20, burst=1)
+    assert buckets.acquire('client') == 0
+    assert buckets.acquire('client') == 1
+    time.sleep(0.1)
+    assert buckets.acquire('client') == 0
+
+
+def test_forgotten_clients_start_with_a_full_bucket():
+    buckets = TokenBuckets(rate=0.001, burst=1, max_clients=2)
+    for client in ('a', 'b', 'c'):
+        assert buckets.acquire(client) == 0
+    assert len(buckets._buckets) == 2
+    assert buckets.acquire('b') > 0
+    assert buckets.acquire('a') == 0
+
+
+def concurrently(flight, key, func, callers=5):
+    results = [None] * callers
+    errors = [None] * callers
+
+    def call(i):
+        try:
+            results[i] = flight.do(key, func)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_single_flight_shares_a_call():
+    flight = SingleFlight('test')
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'rows': []}
+
+    results, errors = concurrently(flight, 'key', slow)
+    assert len(calls) == 1
+    assert errors == [None] * 5
+    assert all(result is results[0] for result in results)
+    # Once done, the next call runs again
+    flight.do('key', slow)
+    assert len(calls) == 2
+
+
+def test_single_flight_shares_the_error():
+    flight = SingleFlight('test')
+
+    def failing():
+        time.sleep(0.2)
+        raise ValueError('hive down')
+
+    results, errors = concurrently(flight, 'key', failing)
+    assert all(isinstance(error, ValueError) for error in errors)
+    with pytest.raises(ValueError):
+        flight.do('key', failing)
+
+
+def test_single_flight_keys_are_independent():
+    flight = SingleFlight('test')
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('b', lambda: 2) == 2
+    assert flight._calls == {}
+
+
+def test_clients_over_budget_get_a_429(app, client, monkeypatch):
+    from ensembl.production.gifts.app import main
+    monkeypatch.setattr(main, 'rate_limits', TokenBuckets(rate=0.01, burst=2))
+    monkeypatch.setitem(app.config, 'RATE_LIMIT_CLIENT_HEADER', 'X-Forwarded-For')
+    proxied = {'X-Forwarded-For': '10.0.0.1, 10.0.0.2'}
+    assert [client.get('/jobs?ids=1', headers=proxied).status_code for _ in range(2)] == [200, 200]
+    response = client.get('/jobs?ids=1', headers=proxied)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) == response.json['retry_after'] > 0
+    # Clients are told apart by the first forwarded address
+    assert client.get('/jobs?ids=1', headers={'X-Forwarded-For': '10.0.0.2'}).status_code == 200
+    # Pages not reading the hive are not limited
+    assert client.get('/health', headers=proxied).status_code == 200